@@ -1,155 +1,183 @@
-from flask import Flask, Response, jsonify, request
-from arvo_helper import get_arvo_html, get_box_order_html
-
-app = Flask(__name__)
-
-# In-memory store for checkbox state:
-# { "YYYY-MM-DD": { "section|Lot X|box": true/false, ... } }
-BOX_STATE: dict[str, dict[str, bool]] = {}
-
-
-@app.route("/")
-def home():
+import hashlib
+import json
+import logging
+import os
+import queue
+import time
+from datetime import date as Date, timedelta
+
+import metrics
+import prefetch
+import profiling
+import snapshot
+
+from flask import Flask, Response, abort, g, jsonify, request
+from arvo_helper import (
+    MAX_VIEW_DAYS,
+    PRISM_BREAKER,
+    RenderedPage,
+    TRACKWORK_CACHE,
+    data_etag,
+    days_etag,
+    get_cached_trackwork_days,
+    get_days_data,
+    get_days_page,
+    get_trackwork_days,
+    melbourne_today,
+    stream_days_page,
+)
+from assets import ASSETS_BY_FILENAME, IMMUTABLE_CACHE_CONTROL, stylesheet_links
+from box_state import AHEAD_DAYS, RETAIN_DAYS, BoxStateError, BoxStateStore, backend_from_env
+from compression import (
+    COMPRESS_MIN_BYTES,
+    COMPRESSIBLE_MIMETYPES,
+    choose_encoding,
+    compress,
+    gzip_stream,
+)
+
+# static/ is served by /assets/ under content-hashed names instead.
+app = Flask(__name__, static_folder=None)
+
+# Checkbox state: { "YYYY-MM-DD": { "section|Lot X|box": true/false, ... } },
+# kept hot in memory and persisted by the configured backend.
+BOX_STATE = BoxStateStore(backend_from_env())
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+
+
+def _process_started_at() -> float:
+    """Wall-clock time this process started (from /proc on Linux), else now."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, starttime, in clock ticks since boot; fields resume after "(comm)".
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+# Seconds from process start to the first response leaving a view, set once.
+BOOT_TO_FIRST_BYTE: float | None = None
+
+# Serve the last good schedule from disk until Prism answers after a cold start.
+snapshot.install()
+
+# Keeps today's (and, later in the day, tomorrow's) pages warm.
+PREFETCH = prefetch.start_from_env()
+
+# Comment lines sent on idle streams so proxies don't close them.
+SSE_KEEPALIVE_SECONDS = 15
+
+HTTP_SECONDS = metrics.Histogram(
+    "arvo_http_request_duration_seconds",
+    "Time to produce each response (for streams, until the body starts).",
+    ("endpoint", "status"),
+)
+BOX_STATE_POLLS = metrics.Counter(
+    "arvo_box_state_polls_total",
+    "GET /api/boxes/state by outcome: full, delta or not_modified.",
+    ("result",),
+)
+metrics.Callback(
+    "arvo_trackwork_cache_events_total",
+    "Trackwork cache lookups and loads by outcome.",
+    lambda: {k: v for k, v in TRACKWORK_CACHE.snapshot_stats().items() if k != "size"},
+    type="counter",
+    labelname="event",
+)
+metrics.Callback(
+    "arvo_trackwork_cache_entries",
+    "(trainer, date) payloads held by the trackwork cache.",
+    lambda: TRACKWORK_CACHE.snapshot_stats()["size"],
+)
+metrics.Callback(
+    "arvo_prism_breaker_state",
+    "1 for the Prism circuit breaker's current state.",
+    lambda: {state: int(PRISM_BREAKER.state == state) for state in ("closed", "half-open", "open")},
+    labelname="state",
+)
+metrics.Callback(
+    "arvo_box_state_dates",
+    "Dates with box state held in memory.",
+    lambda: BOX_STATE.snapshot_stats()["dates"],
+)
+metrics.Callback(
+    "arvo_box_state_streams",
+    "Open /api/boxes/stream connections per date.",
+    lambda: BOX_STATE.snapshot_stats()["streams"],
+    labelname="date",
+)
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    metrics.start_trace()
+
+
+@app.after_request
+def observe_latency(resp: Response) -> Response:
+    # Registered first, so it runs after the other hooks and counts compression too.
+    started = g.get("started")
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, request.endpoint or "unmatched", str(resp.status_code))
+    return resp
+
+
+@app.after_request
+def record_first_byte(resp: Response) -> Response:
+    global BOOT_TO_FIRST_BYTE
+    if BOOT_TO_FIRST_BYTE is None:
+        BOOT_TO_FIRST_BYTE = time.time() - PROCESS_STARTED_AT
+        app.logger.info("Boot to first byte: %.0f ms (%s)", BOOT_TO_FIRST_BYTE * 1000, request.path)
+    return resp
+
+
+@app.after_request
+def compress_response(resp: Response) -> Response:
+    """
+    Compress whole HTML/JSON bodies the views didn't already encode. Streams
+    and bodies under COMPRESS_MIN_BYTES go out as they are.
+    """
+    if (
+        resp.mimetype not in COMPRESSIBLE_MIMETYPES
+        or resp.is_streamed
+        or resp.direct_passthrough
+        or "Content-Encoding" in resp.headers
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if resp.status_code != 200 or (resp.content_length or 0) < COMPRESS_MIN_BYTES:
+        return resp
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding == "identity":
+        return resp
+    resp.set_data(compress(resp.get_data(), encoding, fast=True))
+    resp.headers["Content-Encoding"] = encoding
+    etag, weak = resp.get_etag()
+    if etag:
+        resp.set_etag(f"{etag}-{encoding}", weak)
+    return resp
+
+
+# Opt-in cProfile reports (PROFILE_TOKEN) and the slow-request log.
+profiling.install(app)
+
+
+def _home_html() -> str:
     # Landing page with Te Akau-inspired styling
-    return """
+    return f"""
     <!doctype html>
     <html>
     <head>
       <meta charset="utf-8">
       <title>Te Akau Stable Helper</title>
-      <style>
-        :root {
-          --ta-tangerine: #f58220;
-          --ta-tangerine-dark: #e06f10;
-          --ta-navy: #002a4d;
-          --ta-bg: #f5f5f5;
-          --ta-text: #222222;
-        }
-
-        * {
-          box-sizing: border-box;
-        }
-
-        body {
-          margin: 0;
-          font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-          color: var(--ta-text);
-          background: linear-gradient(
-            180deg,
-            var(--ta-navy) 0,
-            var(--ta-navy) 230px,
-            var(--ta-bg) 230px
-          );
-        }
-
-        .shell {
-          max-width: 960px;
-          margin: 0 auto;
-          padding: 24px 20px 40px;
-        }
-
-        .top-bar {
-          display: flex;
-          align-items: center;
-          justify-content: space-between;
-          color: #ffffff;
-        }
-
-        .brand-mark {
-          font-size: 13px;
-          letter-spacing: 0.18em;
-          text-transform: uppercase;
-          opacity: 0.9;
-        }
-
-        .top-bar-title {
-          font-size: 28px;
-          font-weight: 700;
-          margin: 6px 0 0;
-        }
-
-        .hero-card {
-          background: #ffffff;
-          border-radius: 18px;
-          padding: 24px 24px 28px;
-          margin-top: 32px;
-          box-shadow: 0 18px 36px rgba(0, 0, 0, 0.12);
-        }
-
-        .hero-heading {
-          font-size: 22px;
-          font-weight: 700;
-          color: var(--ta-navy);
-          margin: 0 0 4px;
-        }
-
-        .hero-subtitle {
-          font-size: 14px;
-          color: #555;
-          margin: 0 0 20px;
-        }
-
-        .divider {
-          width: 60px;
-          height: 3px;
-          border-radius: 999px;
-          background: var(--ta-tangerine);
-          margin-bottom: 18px;
-        }
-
-        .btn-container {
-          display: flex;
-          flex-wrap: wrap;
-          gap: 10px;
-          margin-top: 4px;
-        }
-
-        a.btn {
-          display: inline-block;
-          padding: 10px 16px;
-          border-radius: 50px;
-          text-decoration: none;
-          font-size: 14px;
-          font-weight: 600;
-          border: 1px solid transparent;
-          transition: background 0.16s ease, color 0.16s ease, transform 0.08s ease;
-          cursor: pointer;
-        }
-
-        a.btn-primary {
-          background: var(--ta-tangerine);
-          color: #ffffff;
-        }
-        a.btn-primary:hover {
-          background: var(--ta-tangerine-dark);
-          transform: translateY(-1px);
-        }
-
-        a.btn-secondary {
-          background: #ffffff;
-          color: var(--ta-navy);
-          border-color: rgba(0,0,0,0.08);
-        }
-        a.btn-secondary:hover {
-          background: #f3f3f3;
-          transform: translateY(-1px);
-        }
-
-        .footer-note {
-          margin-top: 22px;
-          font-size: 12px;
-          color: #777;
-        }
-
-        @media (max-width: 600px) {
-          .hero-card {
-            padding: 18px 16px 22px;
-          }
-          .top-bar-title {
-            font-size: 22px;
-          }
-        }
-      </style>
+      {"".join(stylesheet_links("theme.css", "home.css"))}
     </head>
     <body>
       <div class="shell">
@@ -171,6 +199,10 @@ def home():
             <a href="/arvo" class="btn btn-primary">Arvo Tasks</a>
             <a href="/boxes" class="btn btn-secondary">Box Order (Muck Out)</a>
           </div>
+          <div class="week-links">
+            Week ahead: <a href="/arvo?days={MAX_VIEW_DAYS}">Arvo Tasks</a> ·
+            <a href="/boxes?days={MAX_VIEW_DAYS}">Box Order</a>
+          </div>
 
           <div class="footer-note">
             Powered by your Prism login · Updates with each new day’s schedule.
@@ -182,42 +214,352 @@ def home():
     """
 
 
+# The landing page never changes while the process runs: render and compress it once.
+HOME_PAGE = RenderedPage(_home_html())
+HOME_ETAG = f"home-{hashlib.sha1(HOME_PAGE.html.encode()).hexdigest()[:16]}"
+
+
+@app.route("/")
+def home():
+    return _cached_response(HOME_ETAG, lambda: HOME_PAGE, "text/html", None)
+
+
+def requested_days() -> tuple[Date, ...]:
+    """
+    The days a page asks for: ?date=YYYY-MM-DD (default today, Melbourne
+    time) and the ?days=N (default 1, at most MAX_VIEW_DAYS) starting there.
+
+    Every day must fall inside the window box state is kept for (RETAIN_DAYS
+    back, AHEAD_DAYS ahead), so the page's checkboxes can sync and arbitrary
+    dates don't each cost a Prism fetch, a cache entry and a snapshot file.
+    """
+    start = request.args.get("date")
+    try:
+        first = Date.fromisoformat(start) if start else melbourne_today()
+    except ValueError:
+        abort(400, f"invalid date {start!r}, expected YYYY-MM-DD")
+    days = request.args.get("days", "1")
+    try:
+        count = int(days)
+    except ValueError:
+        abort(400, f"invalid days {days!r}, expected a whole number")
+    if not 1 <= count <= MAX_VIEW_DAYS:
+        abort(400, f"days must be between 1 and {MAX_VIEW_DAYS}")
+
+    today = melbourne_today()
+    try:
+        last = first + timedelta(days=count - 1)
+    except OverflowError:
+        last = Date.max
+    if first < today - timedelta(days=RETAIN_DAYS) or last > today + timedelta(days=AHEAD_DAYS):
+        abort(400, f"dates must be within {RETAIN_DAYS} days before and {AHEAD_DAYS} days after today")
+    return tuple(first + timedelta(days=i) for i in range(count))
+
+
+def page_response(view: str) -> Response:
+    """
+    Serve a rendered view of the requested days with a strong ETag. Browsers
+    must revalidate every time, and get an empty 304 (without re-rendering)
+    while the schedule is unchanged. The page is compressed once per
+    encoding and cached with the render.
+
+    On a cold cache the page is streamed instead: the head and page chrome
+    go out straight away and each day follows once Prism answers, all days
+    being fetched concurrently.
+    """
+    days = requested_days()
+    trackworks = get_cached_trackwork_days(days)
+    if trackworks is None:
+        encoding = choose_encoding(request.accept_encodings, ("gzip",))
+        chunks = stream_days_page(view, days)
+        resp = Response(gzip_stream(chunks) if encoding == "gzip" else chunks, mimetype="text/html")
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+        return _page_headers(resp, trackworks)
+
+    etag = days_etag(view, days, trackworks)
+    return _cached_response(etag, lambda: get_days_page(view, days, trackworks), "text/html", trackworks)
+
+
+def _cached_response(etag: str, get_page, mimetype: str, trackworks) -> Response:
+    """
+    A RenderedPage in the best encoding the client accepts, or an empty 304
+    (without calling get_page) if the client already holds it.
+    """
+    encoding = choose_encoding(request.accept_encodings)
+    # Each encoding is its own representation, so it gets its own strong ETag.
+    etag = f"{etag}-{encoding}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(get_page().body(encoding), mimetype=mimetype)
+    resp.set_etag(etag)
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    return _page_headers(resp, trackworks)
+
+
+def _page_headers(resp: Response, trackworks) -> Response:
+    if trackworks is not None and any(
+        trackwork.source == "snapshot" for day in trackworks for trackwork in day.values()
+    ):
+        # Restored from disk after a cold start; a refresh from Prism is under way.
+        resp.headers["X-Trackwork-Source"] = "snapshot"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def data_response(view: str) -> Response:
+    """
+    Serve the grouped data behind a view of the requested days as compact
+    JSON (see arvo_helper.days_data), cached and revalidated like the page.
+    Nothing is streamed: on a cold cache every (day, trainer) is fetched
+    concurrently first.
+    """
+    days = requested_days()
+    try:
+        trackworks = get_cached_trackwork_days(days) or get_trackwork_days(days)
+    except Exception:
+        app.logger.exception("Failed to load %s data for %s", view, ", ".join(map(str, days)))
+        resp = jsonify({"ok": False, "error": "Couldn't load the Prism schedule"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "5"
+        return resp
+
+    etag = data_etag(view, days, trackworks)
+    return _cached_response(etag, lambda: get_days_data(view, days, trackworks), "application/json", trackworks)
+
+
 @app.route("/arvo")
 def arvo():
-    html = get_arvo_html()
-    return Response(html, mimetype="text/html")
+    return page_response("arvo")
 
 
 @app.route("/boxes")
 def boxes():
-    html = get_box_order_html()
-    return Response(html, mimetype="text/html")
+    return page_response("boxes")
+
+
+@app.route("/api/arvo")
+def arvo_data():
+    """Barns with their trot-up and swim lists, per day and trainer."""
+    return data_response("arvo")
+
+
+@app.route("/api/boxes")
+def boxes_data():
+    """Sections with their lots' boxes and treadmills, per day and trainer."""
+    return data_response("boxes")
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Trackwork cache hit/miss/refresh counters, for tuning TRACKWORK_TTL."""
+    stats = TRACKWORK_CACHE.snapshot_stats()
+    stats["prism_breaker"] = PRISM_BREAKER.state
+    if BOOT_TO_FIRST_BYTE is not None:
+        stats["boot_to_first_byte_ms"] = round(BOOT_TO_FIRST_BYTE * 1000)
+    return jsonify(stats)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Stage timings, request latencies and counters, in the Prometheus text format."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/assets/<filename>")
+def asset(filename: str):
+    """Versioned static file, precompressed, cacheable forever."""
+    asset = ASSETS_BY_FILENAME.get(filename)
+    if asset is None:
+        abort(404)
+
+    encoding = choose_encoding(request.accept_encodings, asset.variants)
+    resp = Response(asset.variants[encoding], mimetype=asset.mimetype)
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    resp.set_etag(f"{asset.etag}-{encoding}")
+    return resp
 
 
 # ---- Real-time box state API ----
 
+@app.errorhandler(BoxStateError)
+def box_state_error(e):
+    return jsonify({"ok": False, "error": str(e)}), 400
+
+
 @app.route("/api/boxes/state", methods=["GET"])
 def get_boxes_state():
-    """Return checkbox state for a given date (YYYY-MM-DD)."""
+    """
+    Return checkbox state for a given date (YYYY-MM-DD).
+
+    Without `since`, the full { key: checked } map. With `since=<version>`,
+    { "version": n, "changes": {...} } holding only keys changed after that
+    version, or an empty 304 if nothing has. A `since` ahead of the server
+    (e.g. after a restart) gets the full map with "full": true.
+    """
     date = request.args.get("date")
     if not date:
         return jsonify({})
-    return jsonify(BOX_STATE.get(date, {}))
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"ok": False, "error": "since must be a version number"}), 400
+
+    version, delta = BOX_STATE.get(date, since)
+    if delta is None:
+        BOX_STATE_POLLS.inc("not_modified")
+        resp = Response(status=304)
+    elif since is None:
+        BOX_STATE_POLLS.inc("full")
+        resp = jsonify(delta[0])
+    else:
+        BOX_STATE_POLLS.inc("full" if delta[1] else "delta")
+        resp = jsonify(_delta_body(version, *delta))
+    resp.headers["X-Box-State-Version"] = str(version)
+    return resp
 
 
 @app.route("/api/boxes/state", methods=["POST"])
 def update_boxes_state():
     """Update checkbox state for a given date + key."""
-    payload = request.get_json(force=True) or {}
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "error": "expected a JSON object"}), 400
     date = payload.get("date")
     key = payload.get("key")
     checked = bool(payload.get("checked"))
 
-    if not date or not key:
+    if not date or not isinstance(date, str) or not key or not isinstance(key, str):
         return jsonify({"ok": False, "error": "missing date or key"}), 400
 
-    BOX_STATE.setdefault(date, {})[key] = checked
-    return jsonify({"ok": True})
+    version = BOX_STATE.set_many(date, {key: checked})
+    return jsonify({"ok": True, "version": version})
+
+
+@app.route("/api/boxes/state/batch", methods=["POST"])
+def update_boxes_state_batch():
+    """
+    Apply many checkbox updates for a date atomically, as a single version:
+    { "date": "YYYY-MM-DD", "updates": [{ "key": ..., "checked": ... }, ...] }
+    """
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "error": "expected a JSON object"}), 400
+    date = payload.get("date")
+    items = payload.get("updates")
+
+    if not date or not isinstance(date, str) or not isinstance(items, list):
+        return jsonify({"ok": False, "error": "missing date or updates"}), 400
+
+    updates = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("key"), str) or not item["key"]:
+            return jsonify({"ok": False, "error": "every update needs a string key"}), 400
+        updates[item["key"]] = bool(item.get("checked"))
+
+    if not updates:
+        return jsonify({"ok": True, "version": BOX_STATE.get(date)[0]})
+
+    version = BOX_STATE.set_many(date, updates)
+    return jsonify({"ok": True, "version": version})
+
+
+def _delta_body(version: int, changes: dict[str, bool], full: bool = False) -> dict:
+    body = {"version": version, "changes": changes}
+    if full:
+        body["full"] = True
+    return body
+
+
+def _sse_event(event_id: str, date: str, version: int, changes: dict[str, bool], full: bool = False) -> str:
+    body = {"date": date, **_delta_body(version, changes, full)}
+    return f"id: {event_id}\ndata: {json.dumps(body)}\n\n"
+
+
+def _event_id(sent: dict[str, int], dates: list[str]) -> str:
+    # A single date keeps the bare version number, as pages have always sent it back.
+    if len(dates) == 1:
+        return str(sent[dates[0]])
+    return ",".join(f"{date}:{version}" for date, version in sent.items())
+
+
+def _parse_event_id(value: str | None, dates: list[str]) -> dict[str, int | None]:
+    """Last-Event-ID back to {date: version}; None for dates it doesn't cover."""
+    seen = dict.fromkeys(dates)
+    try:
+        if value and len(dates) == 1:
+            seen[dates[0]] = int(value)
+        elif value:
+            for part in value.split(","):
+                date, _, version = part.partition(":")
+                if date in seen:
+                    seen[date] = int(version)
+    except ValueError:
+        return dict.fromkeys(dates)
+    return seen
+
+
+@app.route("/api/boxes/stream")
+def stream_boxes_state():
+    """
+    Server-Sent Events stream of checkbox changes for one or more dates
+    (?date=...&date=...). Events have the `since` poll's shape plus their
+    date, { date, version, changes }: first the full state of each date (or
+    only what was missed, when the browser reconnects with Last-Event-ID),
+    then one event per change containing only the changed keys. The event
+    id holds the version of each date sent so far: "n" for a single date,
+    "YYYY-MM-DD:n,..." for several.
+    """
+    dates = list(dict.fromkeys(request.args.getlist("date")))
+    if not dates:
+        return jsonify({"ok": False, "error": "missing date"}), 400
+    if len(dates) > MAX_VIEW_DAYS:
+        return jsonify({"ok": False, "error": f"at most {MAX_VIEW_DAYS} dates"}), 400
+    last_seen = _parse_event_id(request.headers.get("Last-Event-ID"), dates)
+
+    q: queue.Queue = queue.Queue()
+    first = []
+    try:
+        for date in dates:
+            _, version, delta = BOX_STATE.subscribe(date, last_seen[date], q)
+            first.append((date, version, *(delta or ({}, False))))
+    except BoxStateError:
+        for date, *_ in first:
+            BOX_STATE.unsubscribe(date, q)
+        raise
+
+    def events():
+        sent: dict[str, int] = {}
+        try:
+            yield "retry: 3000\n"
+            for date, version, changes, full in first:
+                sent[date] = version
+                yield _sse_event(_event_id(sent, dates), date, version, changes, full)
+            while True:
+                try:
+                    date, version, changes = q.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                sent[date] = version
+                yield _sse_event(_event_id(sent, dates), date, version, changes)
+        finally:
+            for date in dates:
+                BOX_STATE.unsubscribe(date, q)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
@@ -1,26 +1,101 @@
+import codecs
 import hashlib
 import json
+import logging
 import os
-from collections import defaultdict
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from assets import ASSETS_BY_FILENAME, asset_url, stylesheet_links
+from compression import ENCODINGS, compress
+from metrics import Counter, timed
+
+log = logging.getLogger(__name__)
 
 # ---------------------------
 # LOGIN + DATA FETCH
 # ---------------------------
 
+# Where Prism lives; point it at bench/fake_prism.py to run without prism.horse.
+PRISM_BASE_URL = os.environ.get("PRISM_BASE_URL", "https://www.prism.horse").rstrip("/")
+
+# Keep-alive connections to Prism, shared by every session we log in with,
+# so a re-login doesn't throw away the pooled TLS connections.
+PRISM_POOL_SIZE = int(os.environ.get("PRISM_POOL_SIZE", "10"))
+_PRISM_ADAPTER = HTTPAdapter(pool_connections=1, pool_maxsize=PRISM_POOL_SIZE)
+
+# Status codes Prism answers with once the x-auth-token has expired.
+AUTH_ERROR_STATUSES = (401, 403)
+
+# Seconds to wait for a TCP/TLS connection, and between bytes of a response.
+PRISM_CONNECT_TIMEOUT = float(os.environ.get("PRISM_CONNECT_TIMEOUT", "3.05"))
+PRISM_READ_TIMEOUT = float(os.environ.get("PRISM_READ_TIMEOUT", "10"))
+# Seconds one trackwork load may spend on Prism in total: login, retries and body.
+PRISM_DEADLINE = float(os.environ.get("PRISM_DEADLINE", "20"))
+
+# Trackwork GETs are retried this many times on connection errors, timeouts
+# and these statuses, after a jittered exponential backoff.
+PRISM_GET_RETRIES = int(os.environ.get("PRISM_GET_RETRIES", "2"))
+PRISM_RETRY_BACKOFF = float(os.environ.get("PRISM_RETRY_BACKOFF", "0.25"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+PRISM_ERRORS = Counter(
+    "arvo_prism_errors_total",
+    "Failed Prism calls, by kind: timeout, connection, deadline, circuit_open or the HTTP status.",
+    ("kind",),
+)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """A load ran out of its PRISM_DEADLINE budget."""
+
 
-def prism_login(username, password):
-    login_url = "https://www.prism.horse/api/login"
+class Deadline:
+    """Time budget shared by every Prism call made for one load."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Prism deadline exceeded")
+
+    def timeout(self) -> tuple[float, float]:
+        """(connect, read) timeouts for the next call, capped by what's left."""
+        self.check()
+        remaining = self.remaining()
+        return min(PRISM_CONNECT_TIMEOUT, remaining), min(PRISM_READ_TIMEOUT, remaining)
+
+
+def _timeout(deadline: Deadline | None) -> tuple[float, float]:
+    if deadline is None:
+        return PRISM_CONNECT_TIMEOUT, PRISM_READ_TIMEOUT
+    return deadline.timeout()
+
+
+def prism_login(username, password, deadline: Deadline | None = None):
+    login_url = f"{PRISM_BASE_URL}/api/login"
     hashed_pw = hashlib.md5(password.encode()).hexdigest()
 
     headers = {
         "User-Agent": "Mozilla/5.0",
         "Accept": "application/json, text/plain, */*",
         "Content-Type": "application/json;charset=UTF-8",
-        "Referer": "https://www.prism.horse/portal/login",
+        "Referer": f"{PRISM_BASE_URL}/portal/login",
         "x-auth-username": username,
         "x-auth-password": hashed_pw,
         "x-auth-token": "null",
@@ -34,7 +109,11 @@ def prism_login(username, password):
     }
 
     session = requests.Session()
-    resp = session.post(login_url, headers=headers, json=payload)
+    session.mount(PRISM_BASE_URL, _PRISM_ADAPTER)
+    with timed("login"):
+        resp = session.post(login_url, headers=headers, json=payload, timeout=_timeout(deadline))
+    if not resp.ok:
+        PRISM_ERRORS.inc(str(resp.status_code))
     resp.raise_for_status()
 
     data = resp.json()
@@ -50,6 +129,150 @@ def prism_login(username, password):
     return session
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_prism_session(stale=None, deadline: Deadline | None = None):
+    """
+    Return the process-wide logged-in Prism session.
+
+    Logs in on first use, or again if `stale` (a session that just got an auth
+    error) is still the current one. Concurrent callers wait on a single login.
+    """
+    global _session
+    with _session_lock:
+        if _session is None or _session is stale:
+            _session = prism_login(os.environ["PRISM_USER"], os.environ["PRISM_PASS"], deadline)
+        return _session
+
+
+def with_prism_session(fn, deadline: Deadline | None = None):
+    """Call fn(session) with the shared session, re-authenticating once on 401/403."""
+    session = get_prism_session(deadline=deadline)
+    try:
+        return fn(session)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code not in AUTH_ERROR_STATUSES:
+            raise
+    return fn(get_prism_session(stale=session, deadline=deadline))
+
+
+def prism_get(session, url: str, deadline: Deadline | None = None, stream: bool = False):
+    """
+    GET from Prism with timeouts, retrying connection errors, timeouts and
+    RETRY_STATUSES up to PRISM_GET_RETRIES times. Backoff is "full jitter"
+    (a random sleep up to 0.25s, 0.5s, ...) so callers don't retry in lockstep;
+    no retry is attempted if its sleep would overrun the deadline.
+    """
+    for attempt in range(PRISM_GET_RETRIES + 1):
+        try:
+            with timed("fetch"):
+                r = session.get(url, stream=stream, timeout=_timeout(deadline))
+            if not r.ok:
+                PRISM_ERRORS.inc(str(r.status_code))
+            if r.status_code not in RETRY_STATUSES or attempt == PRISM_GET_RETRIES:
+                r.raise_for_status()
+                return r
+            r.close()
+            log.warning("Prism GET returned %s, retrying", r.status_code)
+        except DeadlineExceeded:
+            PRISM_ERRORS.inc("deadline")
+            raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            PRISM_ERRORS.inc("timeout" if isinstance(e, requests.Timeout) else "connection")
+            if attempt == PRISM_GET_RETRIES:
+                raise
+            log.warning("Prism GET failed (%s), retrying", e)
+        delay = random.uniform(0, PRISM_RETRY_BACKOFF * 2**attempt)
+        if deadline is not None and delay >= deadline.remaining():
+            PRISM_ERRORS.inc("deadline")
+            raise DeadlineExceeded("Prism deadline exceeded before retry")
+        time.sleep(delay)
+
+
+# Consecutive failed loads that open the breaker, and seconds it stays open
+# before letting one trial load through.
+PRISM_BREAKER_THRESHOLD = int(os.environ.get("PRISM_BREAKER_THRESHOLD", "5"))
+PRISM_BREAKER_RESET = float(os.environ.get("PRISM_BREAKER_RESET", "30"))
+
+
+class PrismUnavailable(Exception):
+    """Raised instead of calling Prism while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling Prism after `threshold` consecutive failures. While open,
+    calls fail fast with PrismUnavailable (and the trackwork cache serves
+    whatever it still holds); after `reset_timeout` seconds a single trial
+    call is let through, closing the breaker if it succeeds.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                PRISM_ERRORS.inc("circuit_open")
+                raise PrismUnavailable("Prism circuit breaker is open")
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                log.info("Prism circuit breaker closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial:
+                    log.warning("Prism circuit breaker open after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+    def call(self, fn):
+        """Run fn() through the breaker. Client errors (4xx) don't count against Prism."""
+        self.before_call()
+        try:
+            result = fn()
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and 400 <= status < 500 and status not in RETRY_STATUSES:
+                self.record_success()
+            else:
+                self.record_failure()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+PRISM_BREAKER = CircuitBreaker(PRISM_BREAKER_THRESHOLD, PRISM_BREAKER_RESET)
+
+
 MEL_TZ = ZoneInfo("Australia/Melbourne")
 
 
@@ -59,56 +282,685 @@ def date_to_epoch_ms(dt: date) -> int:
     return int(dt_midnight.timestamp() * 1000)
 
 
-def fetch_trackwork(session, dt: date):
+TRAINER_ID = 118508
+
+
+def _parse_trainers(value: str) -> dict[int, str]:
+    """TRAINER_IDS like "118508:Mark Walker,123456:Jane Doe" -> {id: name}; the name is optional."""
+    trainers = {}
+    for item in value.split(","):
+        trainer_id, _, name = item.strip().partition(":")
+        if trainer_id:
+            trainers[int(trainer_id)] = name.strip() or f"Trainer {trainer_id}"
+    return trainers
+
+
+# Trainers every page covers, in display order. Each one's trackwork is
+# fetched and cached on its own.
+TRAINERS = _parse_trainers(os.environ.get("TRAINER_IDS", f"{TRAINER_ID}:Mark Walker"))
+
+
+def _get_trackwork_response(
+    session, dt: date, trainer_id: int, stream: bool = False, deadline: Deadline | None = None
+):
     due_ms = date_to_epoch_ms(dt)
-    trainer_id = 118508
-    url = f"https://www.prism.horse/api/v2/trackwork/?dueDate={due_ms}&trainerIds={trainer_id}"
-    r = session.get(url)
-    r.raise_for_status()
-    return r.json()
+    url = f"{PRISM_BASE_URL}/api/v2/trackwork/?dueDate={due_ms}&trainerIds={trainer_id}"
+    return prism_get(session, url, deadline, stream=stream)
+
+
+def fetch_trackwork(session, dt: date, trainer_id: int = TRAINER_ID, deadline: Deadline | None = None):
+    return _get_trackwork_response(session, dt, trainer_id, deadline=deadline).json()
+
+
+class Trackwork:
+    """
+    Trackwork for one trainer and date: its TrackworkIndex plus a digest of
+    the raw response body. When the payload was decoded whole, `data` holds
+    it and the index is built from it on first use; a streamed decode or a
+    snapshot keeps only the index.
+
+    `barns` and `box_order` are grouped from the index on first use too, and
+    shared by the rendered pages and the JSON API.
+    """
+
+    __slots__ = ("data", "digest", "source", "_index", "_barns", "_box_order")
+
+    def __init__(
+        self,
+        digest: str,
+        data: dict | None = None,
+        index: "TrackworkIndex | None" = None,
+        source: str = "prism",
+    ):
+        self.data = data
+        self.digest = digest
+        # "prism", or "snapshot" when restored from disk and possibly stale
+        self.source = source
+        self._index = index
+        self._barns = None
+        self._box_order = None
+
+    @property
+    def index(self) -> "TrackworkIndex":
+        if self._index is None:
+            self._index = TrackworkIndex.from_payload(self.data)
+        return self._index
+
+    @property
+    def barns(self):
+        """group_by_barn() of this payload."""
+        if self._barns is None:
+            self._barns = group_by_barn(self.index)
+        return self._barns
+
+    @property
+    def box_order(self):
+        """group_by_section() of this payload."""
+        if self._box_order is None:
+            self._box_order = group_by_section(self.index)
+        return self._box_order
 
 
 # ---------------------------
-# ARVO TASKS
+# TRACKWORK CACHE
 # ---------------------------
 
+# Seconds a payload is served without refreshing it.
+TRACKWORK_TTL = float(os.environ.get("TRACKWORK_TTL", "60"))
+# Seconds past the TTL that a stale payload is still served while it refreshes in the background.
+TRACKWORK_STALE_TTL = float(os.environ.get("TRACKWORK_STALE_TTL", "900"))
+TRACKWORK_CACHE_SIZE = int(os.environ.get("TRACKWORK_CACHE_SIZE", str(16 * len(TRAINERS))))
 
-def group_by_barn(data):
-    trot_key = "Trot Up PM"
-    swim_key = "Swim 1 PM"
 
-    resp = data.get("responseData", {})
-    tasks = resp.get("tasks", [])
+class _Call:
+    __slots__ = ("done", "result", "error")
 
-    barns = defaultdict(lambda: {trot_key: [], swim_key: []})
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
 
-    for task in tasks:
-        barn_obj = task.get("barn") or {}
-        barn_name = task.get("barnName") or barn_obj.get("name") or "Unknown Barn"
 
-        horse_name = (
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs fn(),
+    everyone else arriving while it is in flight waits and gets the same result,
+    or the same exception re-raised.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class TrackworkCache:
+    """
+    LRU cache of Trackwork payloads keyed by (trainer id, due date), with
+    stale-while-revalidate:
+      - younger than `ttl`: served as-is (hit)
+      - up to `stale_ttl` past that: served as-is while a background thread refreshes it
+      - older, or missing: fetched synchronously (miss); if that fails, an
+        older payload is still served rather than the error (stale_on_error)
+
+    All upstream loads for a key go through a SingleFlight, so concurrent misses
+    and a background refresh share one Prism round trip.
+
+    `seeder(trainer_id, dt)` may supply a payload from elsewhere (e.g. a disk
+    snapshot) the first time a key misses; it is served as stale and refreshed
+    in the background. Every `listeners` fn(trainer_id, dt, data) is called
+    after a successful upstream load.
+    """
+
+    def __init__(self, loader, ttl: float, stale_ttl: float, max_size: int):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.seeder = None
+        self.listeners = []
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "seeded": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "stale_on_error": 0,
+        }
+        self._entries: OrderedDict[tuple, tuple[float, Trackwork]] = OrderedDict()
+        self._refreshing: set[tuple] = set()
+        self._seeded: set[tuple] = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get(self, trainer_id: int, dt: date):
+        key = (trainer_id, dt)
+        data = self._lookup(key) or self._seed(key)
+        if data is not None:
+            return data
+        with self._lock:
+            self.stats["misses"] += 1
+        try:
+            return self._load(key)
+        except Exception:
+            # Prism is failing (or the breaker is open): any payload we still
+            # hold, however old, beats an error page.
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    raise
+                self.stats["stale_on_error"] += 1
+            log.warning("Serving trackwork for %s from %.0fs ago; Prism load failed", key, time.monotonic() - entry[0])
+            return entry[1]
+
+    def get_cached(self, trainer_id: int, dt: date):
+        """Like get(), but returns None on a miss instead of fetching."""
+        key = (trainer_id, dt)
+        return self._lookup(key) or self._seed(key)
+
+    def _seed(self, key: tuple):
+        if self.seeder is None:
+            return None
+        with self._lock:
+            if key in self._seeded:
+                return None
+            self._seeded.add(key)
+        try:
+            data = self.seeder(*key)
+        except Exception:
+            log.exception("Seeding trackwork cache failed for %s", key)
+            return None
+        if data is None:
+            return None
+        with self._lock:
+            if key in self._entries:  # a real load won the race
+                return self._entries[key][1]
+            # Store it as already past the TTL, so serving it starts a refresh.
+            self._entries[key] = (time.monotonic() - self.ttl, data)
+            self._evict()
+            self.stats["seeded"] += 1
+            self._start_refresh(key)
+        return data
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            fetched_at, data = entry
+            age = time.monotonic() - fetched_at
+            if age >= self.ttl + self.stale_ttl:
+                return None
+            self._entries.move_to_end(key)
+            if age < self.ttl:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._start_refresh(key)
+            return data
+
+    def _load(self, key: tuple):
+        return self._flight.do(key, lambda: self._fetch(key))
+
+    def _fetch(self, key: tuple):
+        data = self.loader(*key)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), data)
+            self._entries.move_to_end(key)
+            self._evict()
+        for listener in self.listeners:
+            try:
+                listener(*key, data)
+            except Exception:
+                log.exception("Trackwork cache listener failed for %s", key)
+        return data
+
+    def _evict(self):
+        # Caller holds self._lock.
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _start_refresh(self, key: tuple):
+        # Caller holds self._lock.
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+    def refresh(self, trainer_id: int, dt: date):
+        """Fetch a key now, whatever its age, and return the new payload."""
+        data = self._load((trainer_id, dt))
+        with self._lock:
+            self.stats["refreshes"] += 1
+        return data
+
+    def _refresh(self, key: tuple):
+        try:
+            self.refresh(*key)
+        except Exception:
+            log.exception("Background trackwork refresh failed for %s", key)
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+
+# Decode trackwork incrementally into an index (see iter_trackwork_tasks)
+# instead of materialising the whole payload with r.json().
+TRACKWORK_STREAM_PARSE = os.environ.get("TRACKWORK_STREAM_PARSE", "1") == "1"
+
+
+def _load_trackwork(trainer_id: int, dt: date) -> Trackwork:
+    return PRISM_BREAKER.call(lambda: _load_trackwork_from_prism(trainer_id, dt, Deadline(PRISM_DEADLINE)))
+
+
+def _load_trackwork_from_prism(trainer_id: int, dt: date, deadline: Deadline) -> Trackwork:
+    if TRACKWORK_STREAM_PARSE:
+        return with_prism_session(lambda session: stream_trackwork(session, dt, trainer_id, deadline), deadline)
+    r = with_prism_session(lambda session: _get_trackwork_response(session, dt, trainer_id, deadline=deadline), deadline)
+    with timed("decode"):
+        return Trackwork(hashlib.sha1(r.content).hexdigest()[:16], data=r.json())
+
+
+TRACKWORK_CACHE = TrackworkCache(
+    _load_trackwork,
+    ttl=TRACKWORK_TTL,
+    stale_ttl=TRACKWORK_STALE_TTL,
+    max_size=TRACKWORK_CACHE_SIZE,
+)
+
+
+def get_trackwork(dt: date, trainer_id: int = TRAINER_ID) -> Trackwork:
+    """Trackwork for one trainer and Melbourne date, served from TRACKWORK_CACHE."""
+    return TRACKWORK_CACHE.get(trainer_id, dt)
+
+
+def get_cached_trackwork(dt: date, trainer_id: int = TRAINER_ID) -> Trackwork | None:
+    """Trackwork if TRACKWORK_CACHE can serve it without waiting on Prism, else None."""
+    return TRACKWORK_CACHE.get_cached(trainer_id, dt)
+
+
+# Most days one page (or one box-state stream) can cover.
+MAX_VIEW_DAYS = 7
+
+# (day, trainer) payloads fetched at once, for a page or by warm_day(). Enough
+# for a whole MAX_VIEW_DAYS page in one round trip, as far as the
+# PRISM_POOL_SIZE pooled connections allow: each fetch holds one while it runs.
+TRACKWORK_FETCH_WORKERS = int(
+    os.environ.get("TRACKWORK_FETCH_WORKERS", str(min(PRISM_POOL_SIZE, MAX_VIEW_DAYS * len(TRAINERS))))
+)
+_fetch_pool = ThreadPoolExecutor(TRACKWORK_FETCH_WORKERS, thread_name_prefix="trackwork-fetch")
+
+
+def fetch_trackwork_days(days, trainers=TRAINERS) -> list[dict[int, Future]]:
+    """
+    Start loading every (day, trainer)'s trackwork concurrently, through the
+    cache. Returns, per day, {trainer_id: Future}.
+    """
+    return [{trainer_id: _fetch_pool.submit(get_trackwork, dt, trainer_id) for trainer_id in trainers} for dt in days]
+
+
+def get_trackwork_days(days, trainers=TRAINERS) -> list[dict[int, Trackwork]]:
+    """Per day, {trainer_id: Trackwork}, all fetched concurrently."""
+    return [
+        {trainer_id: future.result() for trainer_id, future in futures.items()}
+        for futures in fetch_trackwork_days(days, trainers)
+    ]
+
+
+def get_cached_trackwork_days(days, trainers=TRAINERS) -> list[dict[int, Trackwork]] | None:
+    """Like get_trackwork_days(), if all of it can be served from cache, else None."""
+    schedule = [{trainer_id: get_cached_trackwork(dt, trainer_id) for trainer_id in trainers} for dt in days]
+    if any(trackwork is None for day in schedule for trackwork in day.values()):
+        return None
+    return schedule
+
+
+def melbourne_today() -> date:
+    return datetime.now(MEL_TZ).date()
+
+
+# ---------------------------
+# TRACKWORK INDEX
+# ---------------------------
+
+
+def _parse_lot_number(group_name: str):
+    """
+    Extract the lot number from a groupName like 'Lot 1 4:45'.
+    Returns an int or None if it can't be parsed.
+    """
+    if not group_name:
+        return None
+    parts = group_name.split()
+    if len(parts) < 2:
+        return None
+    if parts[0].lower() != "lot":
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+def _section_for_barn(barn_name: str | None) -> str | None:
+    """Box order section: 'abc' for Barns A, B, C, 'd' for Barn D, else None."""
+    if not barn_name:
+        return None
+    if barn_name.startswith("Barn D"):
+        return "d"
+    if (
+        barn_name.startswith("Barn A")
+        or barn_name.startswith("Barn B")
+        or barn_name.startswith("Barn C")
+    ):
+        return "abc"
+    return None
+
+
+class TaskRecord:
+    """One trackwork task, reduced to the fields the views use."""
+
+    __slots__ = ("id", "barn", "section", "horse", "box", "group", "lot", "labels", "treadmill")
+
+    def __init__(self, task: dict):
+        barn_obj = task.get("barn") or {}
+        self.id = task.get("id")
+        self.barn = task.get("barnName") or barn_obj.get("name")
+        self.section = _section_for_barn(self.barn)
+        self.horse = (
             task.get("horseName")
-            or task.get("horse", {}).get("name")
+            or (task.get("horse") or {}).get("name")
             or ""
         ).strip()
-        if not horse_name:
-            continue
+
+        box_name = task.get("boxName") or (task.get("boxInfo") or {}).get("name")
+        self.box = str(box_name).strip() if box_name else ""
+
+        self.group = (task.get("groupName") or "").strip()
+        self.treadmill = "treadmill" in self.group.lower()
+
+        lot_num = _parse_lot_number(self.group)
+        # Lot of a task whose groupName is a parent task id is filled in by the index.
+        self.lot = f"Lot {lot_num}" if lot_num is not None else None
 
         labels = []
         for ow in task.get("otherWorks") or []:
             label = (ow.get("label") or "").strip()
             if label:
                 labels.append(label)
-
         ow_string = (task.get("otherWorksString") or "").strip()
         if ow_string:
             labels.append(ow_string)
+        self.labels = tuple(labels)
+
+    def to_row(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: list) -> "TaskRecord":
+        record = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, row):
+            setattr(record, name, value)
+        record.labels = tuple(record.labels)
+        return record
+
+
+class TrackworkIndex:
+    """
+    Tasks of one trackwork payload, normalised in a single pass, with lookup
+    maps by barn, lot label and otherWorks label. Built once per payload
+    (see Trackwork.index) and shared by every view.
+
+    Child tasks whose groupName is a numeric parent task id get that
+    parent's lot; treadmill tasks never belong to a lot.
+    """
+
+    __slots__ = ("tasks", "by_barn", "by_lot", "by_label")
+
+    def __init__(self, tasks: list[TaskRecord]):
+        self.tasks = tasks
+        self.by_barn: dict[str | None, list[TaskRecord]] = defaultdict(list)
+        self.by_lot: dict[str, list[TaskRecord]] = defaultdict(list)
+        self.by_label: dict[str, list[TaskRecord]] = defaultdict(list)
+
+        lot_by_id = {t.id: t.lot for t in tasks if t.lot is not None}
+        for t in tasks:
+            if t.treadmill:
+                t.lot = None
+            elif t.lot is None and t.group.isdigit():
+                t.lot = lot_by_id.get(int(t.group))
+
+            self.by_barn[t.barn].append(t)
+            if t.lot is not None:
+                self.by_lot[t.lot].append(t)
+            for label in t.labels:
+                self.by_label[label].append(t)
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "TrackworkIndex":
+        resp = data.get("responseData", {})
+        return cls([TaskRecord(task) for task in resp.get("tasks", [])])
+
 
-        if trot_key in labels:
-            barns[barn_name][trot_key].append(horse_name)
+def as_index(data) -> TrackworkIndex:
+    """Accept either a raw trackwork payload or an already built index."""
+    if isinstance(data, TrackworkIndex):
+        return data
+    return TrackworkIndex.from_payload(data)
 
-        if swim_key in labels:
-            barns[barn_name][swim_key].append(horse_name)
+
+# ---------------------------
+# STREAMING DECODE
+# ---------------------------
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _JsonReader:
+    """Pull-style reader over a JSON document arriving as text chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it ('' at the end)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset {self.pos} of trackwork stream")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise
+            # A bare number cut off by the end of a chunk ("12" of "123", "1." of "1.5")
+            # still decodes; only trust it once something that can't continue it follows.
+            if (
+                isinstance(value, (int, float))
+                and (end == len(self.buf) or self.buf[end] in "0123456789+-.eE")
+                and not self.eof
+                and self._more()
+            ):
+                continue
+            self.pos = end
+            return value
+
+    def items(self, close: str):
+        """After an opening '{' or '[': yield once per member, leaving the reader on it."""
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            ch = self.peek()
+            self.pos += 1
+            if ch == close:
+                return
+            if ch != ",":
+                raise ValueError(f"expected ',' or {close!r} in trackwork stream")
+
+    def drain(self):
+        while self._more():
+            self.pos = len(self.buf)
+
+
+def iter_trackwork_tasks(chunks):
+    """
+    Yield the task dicts of responseData.tasks from a trackwork JSON document
+    given as an iterable of text chunks. Only one task is decoded at a time;
+    everything else in the document is skipped.
+    """
+    reader = _JsonReader(chunks)
+    reader.expect("{")
+    for _ in reader.items("}"):
+        key = reader.value()
+        reader.expect(":")
+        if key != "responseData" or reader.peek() != "{":
+            reader.value()
+            continue
+        reader.expect("{")
+        for _ in reader.items("}"):
+            key = reader.value()
+            reader.expect(":")
+            if key != "tasks" or reader.peek() != "[":
+                reader.value()
+                continue
+            reader.expect("[")
+            for _ in reader.items("]"):
+                yield reader.value()
+    reader.drain()
+
+
+def _text_chunks(r, hasher, chunk_size: int = STREAM_CHUNK_SIZE, deadline: Deadline | None = None):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in r.iter_content(chunk_size):
+        # The read timeout bounds each read, not the whole body.
+        if deadline is not None:
+            deadline.check()
+        hasher.update(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def index_trackwork_response(r, deadline: Deadline | None = None) -> Trackwork:
+    """Build a Trackwork from a streamed response, keeping only TaskRecords."""
+    hasher = hashlib.sha1()
+    chunks = _text_chunks(r, hasher, deadline=deadline)
+    # Includes reading the body, which arrives as it is decoded.
+    with timed("decode"):
+        tasks = [TaskRecord(task) for task in iter_trackwork_tasks(chunks)]
+    return Trackwork(hasher.hexdigest()[:16], index=TrackworkIndex(tasks))
+
+
+def stream_trackwork(
+    session, dt: date, trainer_id: int = TRAINER_ID, deadline: Deadline | None = None
+) -> Trackwork:
+    with _get_trackwork_response(session, dt, trainer_id, stream=True, deadline=deadline) as r:
+        return index_trackwork_response(r, deadline)
+
+
+# ---------------------------
+# ARVO TASKS
+# ---------------------------
+
+# Shown in place of a day whose trackwork failed to load after the head was sent.
+DAY_ERROR_HTML = "\n    <p class='subtitle'>Couldn&#39;t load the Prism schedule just now. Refresh to try again.</p>"
+
+PAGE_END_HTML = "\n" + "\n".join(["  </main>", "</div>", "</body></html>"])
+
+
+def day_heading_html(day_date: date) -> str:
+    return f"    <h2 class='day-heading'>{day_date:%A} {day_date.day} {day_date:%B}</h2>"
+
+
+def trainer_name(trainer_id: int) -> str:
+    return TRAINERS.get(trainer_id, f"Trainer {trainer_id}")
+
+
+def trainer_heading_html(trainer_id: int) -> str:
+    return f"    <h2 class='trainer-heading'>{trainer_name(trainer_id)}</h2>"
+
+
+def trainer_names(trainer_ids) -> str:
+    """"A", "A and B", "A, B and C"."""
+    names = [trainer_name(trainer_id) for trainer_id in trainer_ids]
+    return " and ".join(filter(None, [", ".join(names[:-1]), names[-1]]))
+
+
+@timed("group_by_barn")
+def group_by_barn(data):
+    trot_key = "Trot Up PM"
+    swim_key = "Swim 1 PM"
+
+    index = as_index(data)
+
+    barns = defaultdict(lambda: {trot_key: [], swim_key: []})
+
+    for key in (trot_key, swim_key):
+        for task in index.by_label.get(key, ()):
+            if task.horse:
+                barns[task.barn or "Unknown Barn"][key].append(task.horse)
 
     # Clean duplicates
     for barn in barns:
@@ -118,9 +970,24 @@ def group_by_barn(data):
     return barns
 
 
-def barns_to_html(barns):
+def barns_to_html(barns, day_date: date | None = None, trainer_id: int = TRAINER_ID):
+    return "".join(iter_barns_html([(day_date, [(trainer_id, lambda: barns)])]))
+
+
+def iter_barns_html(days):
+    """
+    Yield the arvo page in chunks, for one or more days given as
+    [(day_date, [(trainer_id, get_barns)])]. The head and page chrome go out
+    first and each get_barns() is only called after that, so a streamed
+    response shows the page while the schedule is still being fetched.
+
+    With more than one trainer, each day has a section per trainer; one that
+    fails to load doesn't take the others down with it.
+    """
     trot_key = "Trot Up PM"
     swim_key = "Swim 1 PM"
+    trainer_ids = [trainer_id for trainer_id, _ in days[0][1]] if days else [TRAINER_ID]
+    several = len(trainer_ids) > 1
 
     html = [
         "<!doctype html>",
@@ -128,56 +995,7 @@ def barns_to_html(barns):
         "<head>",
         "<meta charset='utf-8'>",
         "<title>Afternoon Tasks - Te Akau</title>",
-        "<style>",
-        ":root {",
-        "  --ta-tangerine: #f58220;",
-        "  --ta-tangerine-dark: #e06f10;",
-        "  --ta-navy: #002a4d;",
-        "  --ta-bg: #f5f5f5;",
-        "  --ta-text: #222222;",
-        "}",
-        "* { box-sizing: border-box; }",
-        "body {",
-        "  margin: 0;",
-        "  font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;",
-        "  color: var(--ta-text);",
-        "  background: linear-gradient(180deg, var(--ta-navy) 0, var(--ta-navy) 220px, var(--ta-bg) 220px);",
-        "}",
-        ".shell { max-width: 960px; margin: 0 auto; padding: 24px 20px 40px; }",
-        ".top-bar { display: flex; align-items: center; justify-content: space-between; color: #fff; }",
-        ".brand-mark { font-size: 13px; letter-spacing: 0.18em; text-transform: uppercase; opacity: 0.9; }",
-        ".top-bar-title { font-size: 26px; font-weight: 700; margin: 6px 0 0; }",
-        ".card {",
-        "  background: #ffffff;",
-        "  border-radius: 18px;",
-        "  padding: 22px 22px 26px;",
-        "  margin-top: 28px;",
-        "  box-shadow: 0 18px 36px rgba(0,0,0,0.12);",
-        "}",
-        ".back-link {",
-        "  display: inline-flex;",
-        "  align-items: center;",
-        "  gap: 6px;",
-        "  text-decoration: none;",
-        "  font-size: 13px;",
-        "  color: var(--ta-navy);",
-        "  margin-bottom: 8px;",
-        "}",
-        ".back-link span { font-size: 16px; }",
-        ".page-title { margin: 4px 0 2px; font-size: 22px; color: var(--ta-navy); }",
-        ".subtitle { font-size: 14px; color: #555; margin-bottom: 16px; }",
-        ".divider { width: 60px; height: 3px; background: var(--ta-tangerine); border-radius: 999px; margin-bottom: 18px; }",
-        "h2 { margin: 18px 0 4px; font-size: 18px; color: var(--ta-navy); }",
-        "strong { color: var(--ta-navy); }",
-        "ul { margin: 4px 0 10px 18px; padding: 0; }",
-        "li { margin: 2px 0; }",
-        "li.both { color: var(--ta-tangerine-dark); font-weight: 600; }",
-        ".legend { font-size: 12px; color: #777; margin-bottom: 10px; }",
-        "@media (max-width: 600px) {",
-        "  .card { padding: 18px 16px 22px; }",
-        "  .top-bar-title { font-size: 22px; }",
-        "}",
-        "</style>",
+        *stylesheet_links("theme.css", "arvo.css"),
         "</head>",
         "<body>",
         "<div class='shell'>",
@@ -190,7 +1008,7 @@ def barns_to_html(barns):
         "  <main class='card'>",
         "    <a href='/' class='back-link'><span>&larr;</span> Back to menu</a>",
         "    <h1 class='page-title'>Horses to Trot Up &amp; Swim</h1>",
-        "    <p class='subtitle'>Auto-generated from today&#39;s Prism schedule for Mark Walker.</p>",
+        f"    <p class='subtitle'>Auto-generated from the Prism schedule for {trainer_names(trainer_ids)}.</p>",
         "    <div class='divider'></div>",
         "    <div class='legend'><strong>Note:</strong> names shown in tangerine appear in both "
         + trot_key
@@ -198,7 +1016,27 @@ def barns_to_html(barns):
         + swim_key
         + ".</div>",
     ]
+    yield "\n".join(html)
+
+    for day_date, trainers in days:
+        if day_date is not None:
+            yield "\n" + day_heading_html(day_date)
 
+        for trainer_id, get_barns in trainers:
+            if several:
+                yield "\n" + trainer_heading_html(trainer_id)
+            try:
+                barns = get_barns()
+            except Exception:
+                log.exception("Failed to load arvo tasks for trainer %s on %s", trainer_id, day_date)
+                yield DAY_ERROR_HTML
+                continue
+            yield from _iter_barns(barns, trot_key, swim_key)
+
+    yield PAGE_END_HTML
+
+
+def _iter_barns(barns, trot_key: str, swim_key: str):
     for barn in sorted(barns.keys()):
         trot = barns[barn][trot_key]
         swim = barns[barn][swim_key]
@@ -208,6 +1046,7 @@ def barns_to_html(barns):
 
         both = set(trot) & set(swim)
 
+        html = []
         html.append(f"<h2>{barn}</h2>")
 
         if trot:
@@ -226,22 +1065,12 @@ def barns_to_html(barns):
                 html.append(f"<li class='{cls}'>{h}</li>")
             html.append("</ul>")
 
-    html.append("  </main>")
-    html.append("</div>")
-    html.append("</body></html>")
-    return "\n".join(html)
-
+        yield "\n" + "\n".join(html)
 
-def get_arvo_html():
-    username = os.environ["PRISM_USER"]
-    password = os.environ["PRISM_PASS"]
 
-    today = datetime.now(MEL_TZ).date()
-
-    session = prism_login(username, password)
-    data = fetch_trackwork(session, today)
-    barns = group_by_barn(data)
-    return barns_to_html(barns)
+def get_arvo_html(day_date: date | None = None):
+    day_date = day_date or melbourne_today()
+    return render_page("arvo", day_date, get_trackwork_days((day_date,))[0])
 
 
 # ---------------------------
@@ -249,37 +1078,20 @@ def get_arvo_html():
 # ---------------------------
 
 
-def _parse_lot_number(group_name: str):
-    """
-    Extract the lot number from a groupName like 'Lot 1 4:45'.
-    Returns an int or None if it can't be parsed.
-    """
-    if not group_name:
-        return None
-    parts = group_name.split()
-    if len(parts) < 2:
-        return None
-    if parts[0].lower() != "lot":
-        return None
-    try:
-        return int(parts[1])
-    except ValueError:
-        return None
-
-
-def box_order_to_html(data, day_date: date) -> str:
+@timed("group_by_section")
+def group_by_section(data):
     """
-    Build HTML for box order, grouped into:
+    Box order data, grouped into:
       - Section 1: Barns A, B, C (lots + treadmills)
       - Section 2: Barn D (lots + treadmills)
 
     Treadmills:
       - Detected via 'treadmill' in groupName (case-insensitive).
       - Box order is preserved in Prism order per section.
-      - Rendered to the right of the Lots table.
+
+    Returns (sections, treadmill_sections, sorted_lots, stats).
     """
-    resp = data.get("responseData", {})
-    tasks = resp.get("tasks", [])
+    index = as_index(data)
 
     # Lots by section
     sections: dict[str, dict[str, list[str]]] = {
@@ -294,7 +1106,7 @@ def box_order_to_html(data, day_date: date) -> str:
     }
 
     stats = {
-        "total_tasks": len(tasks),
+        "total_tasks": len(index.tasks),
         "with_lot": 0,
         "with_box": 0,
         "abc_entries": 0,
@@ -303,78 +1115,34 @@ def box_order_to_html(data, day_date: date) -> str:
 
     all_lots = set()
 
-    # --- Pass 1: build mapping from parent task id -> 'Lot X' label ---
-    lot_id_to_label: dict[int, str] = {}
-
-    for t in tasks:
-        group_name = (t.get("groupName") or "").strip()
-        lot_num = _parse_lot_number(group_name)
-        if lot_num is not None:
-            lot_id_to_label[t.get("id")] = f"Lot {lot_num}"
-
-    # --- Pass 2: assign each task to a lot or treadmill ---
-    for task in tasks:
-        barn_name = task.get("barnName") or (task.get("barn") or {}).get("name")
-        group_name = (task.get("groupName") or "").strip()
-        group_lower = group_name.lower()
-
-        # Determine section (ABC vs D)
-        section_key: str | None = None
-        if barn_name:
-            if barn_name.startswith("Barn D"):
-                section_key = "d"
-            elif (
-                barn_name.startswith("Barn A")
-                or barn_name.startswith("Barn B")
-                or barn_name.startswith("Barn C")
-            ):
-                section_key = "abc"
-
-        # Box name (if any)
-        box_name = task.get("boxName") or (task.get("boxInfo") or {}).get("name")
-        box_str = str(box_name).strip() if box_name else ""
-
-        # --- Treadmills: capture and preserve order, then skip lot logic ---
-        if "treadmill" in group_lower:
-            if section_key and box_str:
-                treadmill_sections[section_key].append(box_str)
-            # treadmills are not lots, so continue to next task
+    for task in index.tasks:
+        # --- Treadmills: capture and preserve order ---
+        if task.treadmill:
+            if task.section and task.box:
+                treadmill_sections[task.section].append(task.box)
             continue
 
-        # --- Lots: as before ---
-        lot_label = None
-
-        # Case 1: this task itself has 'Lot X 4:45'
-        lot_num_direct = _parse_lot_number(group_name)
-        if lot_num_direct is not None:
-            lot_label = f"Lot {lot_num_direct}"
-        else:
-            # Case 2: groupName is numeric -> lookup parent lot by id
-            if group_name.isdigit():
-                parent_id = int(group_name)
-                lot_label = lot_id_to_label.get(parent_id)
-
-        if not lot_label:
+        if not task.lot:
             # Not a lot or treadmill
             continue
 
         stats["with_lot"] += 1
 
-        if not box_str:
+        if not task.box:
             continue
 
         stats["with_box"] += 1
 
-        if section_key == "abc":
+        if task.section == "abc":
             stats["abc_entries"] += 1
-        elif section_key == "d":
+        elif task.section == "d":
             stats["d_entries"] += 1
 
-        if not section_key:
+        if not task.section:
             continue
 
-        sections[section_key][lot_label].append(box_str)
-        all_lots.add(lot_label)
+        sections[task.section][task.lot].append(task.box)
+        all_lots.add(task.lot)
 
     # --- Sort & dedupe boxes, and sort lots numerically ---
 
@@ -400,7 +1168,36 @@ def box_order_to_html(data, day_date: date) -> str:
 
     sorted_lots = sorted(all_lots, key=lot_sort_value)
 
-    date_str = day_date.isoformat()
+    return sections, treadmill_sections, sorted_lots, stats
+
+
+# group_by_section() keys, in page order, with their headings.
+BOX_ORDER_SECTIONS = (("abc", "Barns A, B, C"), ("d", "Barn D"))
+
+
+def box_order_to_html(data, day_date: date, trainer_id: int = TRAINER_ID) -> str:
+    """
+    Build HTML for box order: per section, the lots table and, to the right
+    of it, the treadmills (see group_by_section).
+    """
+    return "".join(iter_box_order_html([(day_date, [(trainer_id, lambda: group_by_section(data))])]))
+
+
+def iter_box_order_html(days):
+    """
+    Yield the box order page in chunks, for one or more days given as
+    [(day_date, [(trainer_id, get_box_order)])]: head and page chrome first,
+    then each get_box_order() is called for its group_by_section() result,
+    and its sections follow as they are rendered.
+
+    box-sync.js keeps the checkboxes under each data-date element in sync:
+    the body for a single day, a div.day per day otherwise. With more than
+    one trainer every box key is prefixed with the trainer's id, since their
+    horses can share a barn.
+    """
+    single = len(days) == 1
+    several = len(days[0][1]) > 1
+    body_attrs = f" data-date='{days[0][0].isoformat()}'" if single else ""
 
     html = [
         "<!doctype html>",
@@ -408,99 +1205,9 @@ def box_order_to_html(data, day_date: date) -> str:
         "<head>",
         "<meta charset='utf-8'>",
         "<title>Box Order - Te Akau</title>",
-        "<style>",
-        ":root {",
-        "  --ta-tangerine: #f58220;",
-        "  --ta-tangerine-dark: #e06f10;",
-        "  --ta-navy: #002a4d;",
-        "  --ta-bg: #f5f5f5;",
-        "  --ta-text: #222222;",
-        "}",
-        "* { box-sizing: border-box; }",
-        "body {",
-        "  margin: 0;",
-        "  font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;",
-        "  color: var(--ta-text);",
-        "  background: linear-gradient(180deg, var(--ta-navy) 0, var(--ta-navy) 220px, var(--ta-bg) 220px);",
-        "}",
-        ".shell { max-width: 960px; margin: 0 auto; padding: 24px 20px 40px; }",
-        ".top-bar { display: flex; align-items: center; justify-content: space-between; color: #fff; }",
-        ".brand-mark { font-size: 13px; letter-spacing: 0.18em; text-transform: uppercase; opacity: 0.9; }",
-        ".top-bar-title { font-size: 26px; font-weight: 700; margin: 6px 0 0; }",
-        ".card {",
-        "  background: #ffffff;",
-        "  border-radius: 18px;",
-        "  padding: 22px 22px 26px;",
-        "  margin-top: 28px;",
-        "  box-shadow: 0 18px 36px rgba(0,0,0,0.12);",
-        "}",
-        ".back-link {",
-        "  display: inline-flex;",
-        "  align-items: center;",
-        "  gap: 6px;",
-        "  text-decoration: none;",
-        "  font-size: 13px;",
-        "  color: var(--ta-navy);",
-        "  margin-bottom: 8px;",
-        "}",
-        ".back-link span { font-size: 16px; }",
-        ".page-title { margin: 4px 0 2px; font-size: 22px; color: var(--ta-navy); }",
-        ".subtitle { font-size: 14px; color: #555; margin-bottom: 10px; }",
-        ".debug { font-size: 11px; color: #999; margin-bottom: 16px; }",
-        ".section {",
-        "  margin-top: 18px;",
-        "  padding-top: 4px;",
-        "}",
-        ".section h2 { font-size: 18px; color: var(--ta-navy); margin: 0 0 8px; }",
-        ".section-grid {",
-        "  display: grid;",
-        "  grid-template-columns: minmax(0, 1.7fr) minmax(0, 1.2fr);",
-        "  gap: 16px;",
-        "  align-items: flex-start;",
-        "}",
-        ".panel {",
-        "  background: #fff;",
-        "  border-radius: 12px;",
-        "  padding: 10px 10px 12px;",
-        "  box-shadow: 0 1px 3px rgba(0,0,0,0.06);",
-        "}",
-        ".panel-title {",
-        "  font-size: 14px;",
-        "  font-weight: 600;",
-        "  color: var(--ta-navy);",
-        "  margin: 0 0 6px;",
-        "}",
-        "table {",
-        "  border-collapse: collapse;",
-        "  width: 100%;",
-        "  background: #fff;",
-        "}",
-        "th, td {",
-        "  padding: 6px 8px;",
-        "  border-bottom: 1px solid #eee;",
-        "  vertical-align: top;",
-        "  font-size: 13px;",
-        "}",
-        "th { text-align: left; font-weight: 600; color: var(--ta-navy); }",
-        ".lot-label { white-space: nowrap; font-weight: 600; }",
-        ".boxes label {",
-        "  margin-right: 8px;",
-        "  display: inline-flex;",
-        "  align-items: center;",
-        "  gap: 3px;",
-        "  padding: 2px 0;",
-        "}",
-        ".boxes input[type='checkbox'] {",
-        "  accent-color: var(--ta-tangerine);",
-        "}",
-        "@media (max-width: 700px) {",
-        "  .card { padding: 18px 16px 22px; }",
-        "  .top-bar-title { font-size: 22px; }",
-        "  .section-grid { grid-template-columns: minmax(0, 1fr); }",
-        "}",
-        "</style>",
+        *stylesheet_links("theme.css", "boxes.css"),
         "</head>",
-        f"<body data-date='{date_str}'>",
+        f"<body{body_attrs}>",
         "<div class='shell'>",
         "  <header class='top-bar'>",
         "    <div>",
@@ -512,6 +1219,34 @@ def box_order_to_html(data, day_date: date) -> str:
         "    <a href='/' class='back-link'><span>&larr;</span> Back to menu</a>",
         "    <h1 class='page-title'>Muck Out Checklist</h1>",
         "    <p class='subtitle'>Tick off boxes as you muck out, so no horse comes back to a dirty box.</p>",
+    ]
+    yield "\n".join(html)
+
+    for day_date, trainers in days:
+        if not single:
+            yield f"\n    <div class='day' data-date='{day_date.isoformat()}'>"
+        yield "\n" + day_heading_html(day_date)
+        for trainer_id, get_box_order in trainers:
+            if several:
+                yield "\n" + trainer_heading_html(trainer_id)
+            try:
+                sections, treadmill_sections, sorted_lots, stats = get_box_order()
+            except Exception:
+                log.exception("Failed to load box order for trainer %s on %s", trainer_id, day_date)
+                yield DAY_ERROR_HTML
+            else:
+                key_prefix = f"{trainer_id}|" if several else ""
+                yield from _iter_box_order_sections(sections, treadmill_sections, sorted_lots, stats, key_prefix)
+        if not single:
+            yield "\n    </div>"
+
+    # Real-time checkbox sync (static/box-sync.js)
+    yield f"\n    <script src='{asset_url('box-sync.js')}'></script>"
+    yield PAGE_END_HTML
+
+
+def _iter_box_order_sections(sections, treadmill_sections, sorted_lots, stats, key_prefix: str = ""):
+    html = [
         f"    <div class='debug'>Debug: total tasks={stats['total_tasks']}, "
         f"with lot={stats['with_lot']}, with box={stats['with_box']}, "
         f"ABC entries={stats['abc_entries']}, D entries={stats['d_entries']}</div>",
@@ -537,7 +1272,7 @@ def box_order_to_html(data, day_date: date) -> str:
             if boxes:
                 html.append("              <td class='boxes'>")
                 for b in boxes:
-                    key = f"{section_key}|{lot_label}|{b}"
+                    key = f"{key_prefix}{section_key}|{lot_label}|{b}"
                     html.append(
                         f"                <label><input type='checkbox' class='box-check' "
                         f"data-key='{key}'> {b}</label>"
@@ -561,7 +1296,7 @@ def box_order_to_html(data, day_date: date) -> str:
             html.append("              <td class='lot-label'>Treadmill</td>")
             html.append("              <td class='boxes'>")
             for b in tread_boxes:
-                key = f"{section_key}|Treadmill|{b}"
+                key = f"{key_prefix}{section_key}|Treadmill|{b}"
                 html.append(
                     f"                <label><input type='checkbox' class='box-check' "
                     f"data-key='{key}'> {b}</label>"
@@ -574,79 +1309,265 @@ def box_order_to_html(data, day_date: date) -> str:
             # If no treadmills, still output an empty panel for visual balance
             html.append("        <div class='panel'>")
             html.append("          <div class='panel-title'>Treadmills</div>")
-            html.append("          <p style='font-size: 12px; color: #888; margin: 4px 0 0;'>No treadmills today.</p>")
+            html.append("          <p style='font-size: 12px; color: #888; margin: 4px 0 0;'>No treadmills.</p>")
             html.append("        </div>")
 
         html.append("      </div>")  # section-grid
         html.append("    </section>")
 
-    render_section("Barns A, B, C", "abc")
-    render_section("Barn D", "d")
-
-    # Real-time checkbox sync (unchanged, now also covers treadmills)
-    html.append(
-        """
-    <script>
-    (function() {
-      const body = document.body;
-      const date = body.getAttribute('data-date');
-      const checkboxes = Array.from(document.querySelectorAll('.box-check'));
-
-      function applyState(state) {
-        checkboxes.forEach(cb => {
-          const key = cb.dataset.key;
-          if (Object.prototype.hasOwnProperty.call(state, key)) {
-            cb.checked = !!state[key];
-          }
-        });
-      }
-
-      function fetchState() {
-        fetch(`/api/boxes/state?date=${encodeURIComponent(date)}`)
-          .then(r => r.json())
-          .then(applyState)
-          .catch(console.error);
-      }
-
-      // Initial load
-      fetchState();
-
-      // When user changes a checkbox, send update
-      checkboxes.forEach(cb => {
-        cb.addEventListener('change', () => {
-          const payload = {
-            date: date,
-            key: cb.dataset.key,
-            checked: cb.checked
-          };
-          fetch('/api/boxes/state', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-          }).catch(console.error);
-        });
-      });
-
-      // Poll every 5 seconds to pick up others' changes
-      setInterval(fetchState, 5000);
-    })();
-    </script>
+    for section_key, title in BOX_ORDER_SECTIONS:
+        render_section(title, section_key)
+        yield "\n" + "\n".join(html)
+        html = []
+
+
+def get_box_order_html(day_date: date | None = None):
+    day_date = day_date or melbourne_today()
+    return render_page("boxes", day_date, get_trackwork_days((day_date,))[0])
+
+
+# ---------------------------
+# JSON DATA
+# ---------------------------
+
+
+def barns_to_data(barns) -> list[dict]:
+    """[{"barn", "trot", "swim"}] for barns with any horse to trot up or swim, as on the page."""
+    trot_key = "Trot Up PM"
+    swim_key = "Swim 1 PM"
+
+    return [
+        {"barn": barn, "trot": barns[barn][trot_key], "swim": barns[barn][swim_key]}
+        for barn in sorted(barns.keys())
+        if barns[barn][trot_key] or barns[barn][swim_key]
+    ]
+
+
+def box_order_to_data(box_order) -> list[dict]:
     """
-    )
+    [{"key", "title", "lots": [{"lot", "boxes"}], "treadmills"}] per section,
+    from group_by_section(); lots without boxes are left out.
+    """
+    sections, treadmill_sections, sorted_lots, _ = box_order
+    return [
+        {
+            "key": section_key,
+            "title": title,
+            "lots": [
+                {"lot": lot, "boxes": sections[section_key][lot]}
+                for lot in sorted_lots
+                if sections[section_key].get(lot)
+            ],
+            "treadmills": treadmill_sections[section_key],
+        }
+        for section_key, title in BOX_ORDER_SECTIONS
+    ]
+
+
+# view -> fn(trackwork, key_prefix) giving one trainer's data for a day
+DATA_BUILDERS = {
+    "arvo": lambda trackwork, key_prefix: {"barns": barns_to_data(trackwork.barns)},
+    # Checkbox keys are f"{key_prefix}{section key}|{lot}|{box}", or
+    # f"{key_prefix}{section key}|Treadmill|{box}", as on the page.
+    "boxes": lambda trackwork, key_prefix: {
+        "key_prefix": key_prefix,
+        "sections": box_order_to_data(trackwork.box_order),
+    },
+}
+
+
+def days_data(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> dict:
+    """The grouped data behind a view: {"days": [{"date", "trainers": [{"id", "name", ...}]}]}."""
+    build = DATA_BUILDERS[view]
+    return {
+        "days": [
+            {
+                "date": day_date.isoformat(),
+                "trainers": [
+                    {
+                        "id": trainer_id,
+                        "name": trainer_name(trainer_id),
+                        **build(trackwork, f"{trainer_id}|" if len(day) > 1 else ""),
+                    }
+                    for trainer_id, trackwork in day.items()
+                ],
+            }
+            for day_date, day in zip(days, trackworks)
+        ]
+    }
+
+
+# ---------------------------
+# RENDERED PAGES
+# ---------------------------
+
+PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", "32"))
+
+# view -> fn([(day_date, [(trainer_id, get_trackwork)])]) yielding the page for those days in chunks
+PAGE_STREAMERS = {
+    "arvo": lambda loads: iter_barns_html(
+        [
+            (day_date, [(trainer_id, lambda load=load: load().barns) for trainer_id, load in trainers])
+            for day_date, trainers in loads
+        ]
+    ),
+    "boxes": lambda loads: iter_box_order_html(
+        [
+            (day_date, [(trainer_id, lambda load=load: load().box_order) for trainer_id, load in trainers])
+            for day_date, trainers in loads
+        ]
+    ),
+}
+
+# Changes whenever this module, a static asset or the trainer list does, so a
+# deploy that alters the markup doesn't answer 304 to a browser holding the
+# old page.
+RENDER_VERSION = hashlib.sha1(
+    Path(__file__).read_bytes()
+    + " ".join(sorted(ASSETS_BY_FILENAME)).encode()
+    + repr(TRAINERS).encode()
+).hexdigest()[:8]
+
+
+class RenderedPage:
+    """
+    A rendered view (the HTML page, or its JSON data), plus its compressed
+    bodies, each made once on first request.
+    """
+
+    __slots__ = ("html", "_bodies", "_lock")
+
+    def __init__(self, html: str):
+        self.html = html
+        self._bodies: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def body(self, encoding: str = "identity") -> bytes:
+        with self._lock:
+            body = self._bodies.get(encoding)
+            if body is None:
+                with timed("compress"):
+                    body = self._bodies[encoding] = compress(self.html.encode(), encoding)
+            return body
+
+
+_page_cache: OrderedDict[tuple, RenderedPage] = OrderedDict()
+_page_lock = threading.Lock()
+_page_flight = SingleFlight()
+
+
+def _digests(trackworks: list[dict[int, Trackwork]]) -> tuple:
+    return tuple((trainer_id, trackwork.digest) for day in trackworks for trainer_id, trackwork in day.items())
+
+
+def _page_key(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> tuple:
+    return (view, days, _digests(trackworks))
+
+
+def days_etag(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> str:
+    """
+    Strong ETag for a rendered view of one or more days, each given as
+    {trainer_id: Trackwork}; known before rendering.
+    """
+    digests = _digests(trackworks)
+    if len(digests) == 1:
+        return f"{view}-{days[0].isoformat()}-{digests[0][1]}-{RENDER_VERSION}"
+    digest = hashlib.sha1(" ".join(f"{t}:{d}" for t, d in digests).encode()).hexdigest()[:16]
+    return f"{view}-{days[0].isoformat()}-{len(days)}d-{digest}-{RENDER_VERSION}"
+
+
+def _cached_page(key: tuple, render) -> RenderedPage:
+    with _page_lock:
+        page = _page_cache.get(key)
+        if page is not None:
+            _page_cache.move_to_end(key)
+            return page
+
+    page = _page_flight.do(key, render)
+
+    with _page_lock:
+        _page_cache[key] = page
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return page
 
-    html.append("  </main>")
-    html.append("</div>")
-    html.append("</body></html>")
 
-    return "\n".join(html)
+def get_days_page(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> RenderedPage:
+    """Rendered view, cached per (view, days, payload digests)."""
 
+    def render():
+        loads = [
+            (day_date, [(trainer_id, lambda trackwork=trackwork: trackwork) for trainer_id, trackwork in day.items()])
+            for day_date, day in zip(days, trackworks)
+        ]
+        with timed(f"render_{view}"):
+            return RenderedPage("".join(PAGE_STREAMERS[view](loads)))
 
-def get_box_order_html():
-    username = os.environ["PRISM_USER"]
-    password = os.environ["PRISM_PASS"]
+    return _cached_page(_page_key(view, days, trackworks), render)
 
-    today = datetime.now(MEL_TZ).date()
 
-    session = prism_login(username, password)
-    data = fetch_trackwork(session, today)
-    return box_order_to_html(data, today)
+def data_etag(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> str:
+    """Strong ETag for a view's JSON data (see days_data)."""
+    return days_etag(f"{view}.json", days, trackworks)
+
+
+def get_days_data(view: str, days: tuple[date, ...], trackworks: list[dict[int, Trackwork]]) -> RenderedPage:
+    """A view's data as compact JSON, cached with the pages and built from the same groupings."""
+
+    def render():
+        with timed(f"serialize_{view}"):
+            return RenderedPage(json.dumps(days_data(view, days, trackworks), separators=(",", ":")))
+
+    return _cached_page(_page_key(f"{view}.json", days, trackworks), render)
+
+
+def get_page(view: str, day_date: date, trackworks: dict[int, Trackwork]) -> RenderedPage:
+    """Rendered single-day view, cached per (view, date, payload digests)."""
+    return get_days_page(view, (day_date,), [trackworks])
+
+
+def seed_page(view: str, day_date: date, trackworks: dict[int, Trackwork], html: str):
+    """Put an already rendered view (e.g. from a snapshot) into the page cache."""
+    with _page_lock:
+        _page_cache.setdefault(_page_key(view, (day_date,), [trackworks]), RenderedPage(html))
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+
+
+def render_page(view: str, day_date: date, trackworks: dict[int, Trackwork]) -> str:
+    return get_page(view, day_date, trackworks).html
+
+
+def warm_day(day_date: date, trainers=TRAINERS):
+    """
+    Refetch a day's trackwork for every trainer and pre-render (and
+    pre-compress) every view of it, pages and JSON data alike.
+    """
+    futures = {
+        trainer_id: _fetch_pool.submit(TRACKWORK_CACHE.refresh, trainer_id, day_date) for trainer_id in trainers
+    }
+    trackworks = {trainer_id: future.result() for trainer_id, future in futures.items()}
+    pages = [get_page(view, day_date, trackworks) for view in PAGE_STREAMERS]
+    pages += [get_days_data(view, (day_date,), [trackworks]) for view in DATA_BUILDERS]
+    for page in pages:
+        for encoding in ENCODINGS:
+            page.body(encoding)
+
+
+def stream_days_page(view: str, days: tuple[date, ...]):
+    """
+    Yield a view in chunks for a cold cache: the head goes out before any
+    trackwork is fetched. Every (day, trainer) is fetched at once
+    (fetch_trackwork_days) and each follows as soon as it and those before
+    it have arrived; a slow trainer only holds back what comes after it.
+    """
+    if len(days) == 1 and len(TRAINERS) == 1:
+        # Nothing to overlap; fetch on the serving thread.
+        (trainer_id,) = TRAINERS
+        loads = [(days[0], [(trainer_id, lambda: get_trackwork(days[0], trainer_id))])]
+    else:
+        loads = [
+            (day_date, [(trainer_id, future.result) for trainer_id, future in futures.items()])
+            for day_date, futures in zip(days, fetch_trackwork_days(days))
+        ]
+    return PAGE_STREAMERS[view](loads)
@@ -0,0 +1,56 @@
+"""
+Static CSS/JS for the pages, served from content-hashed URLs.
+
+Every file in static/ is read once at import. Its URL carries a hash of its
+bytes (theme.css -> /assets/theme.3f2a9c1b.css), so it can be cached by
+browsers forever: a changed file gets a new URL. Gzip (and Brotli, when the
+brotli package is installed) variants are compressed once, up front.
+"""
+
+import hashlib
+import mimetypes
+from pathlib import Path
+
+from compression import ENCODINGS, compress
+
+STATIC_DIR = Path(__file__).with_name("static")
+ASSET_PREFIX = "/assets/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    __slots__ = ("name", "filename", "mimetype", "etag", "variants")
+
+    def __init__(self, path: Path):
+        body = path.read_bytes()
+        digest = hashlib.sha1(body).hexdigest()[:8]
+        self.name = path.name
+        self.filename = f"{path.stem}.{digest}{path.suffix}"
+        self.mimetype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.etag = digest
+        # Content-Encoding -> body ("identity" is the uncompressed file)
+        self.variants = {"identity": body}
+        for encoding in ENCODINGS:
+            self.variants[encoding] = compress(body, encoding)
+
+    @property
+    def url(self) -> str:
+        return ASSET_PREFIX + self.filename
+
+
+def _load_assets() -> dict[str, Asset]:
+    assets = [Asset(path) for path in sorted(STATIC_DIR.iterdir()) if path.is_file()]
+    return {asset.name: asset for asset in assets}
+
+
+ASSETS = _load_assets()
+ASSETS_BY_FILENAME = {asset.filename: asset for asset in ASSETS.values()}
+
+
+def asset_url(name: str) -> str:
+    """Versioned URL for a file in static/, e.g. asset_url("theme.css")."""
+    return ASSETS[name].url
+
+
+def stylesheet_links(*names: str) -> list[str]:
+    return [f"<link rel='stylesheet' href='{asset_url(name)}'>" for name in names]
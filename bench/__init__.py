@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for arvo_helper. Nothing here talks to prism.horse; run
+modules from the repo root, e.g. `python -m bench.parse`, or
+`python -m bench.suite` against the local stand-in in bench.fake_prism.
+"""
@@ -0,0 +1,126 @@
+"""
+A local stand-in for Prism's login and trackwork endpoints, serving
+synthetic payloads (see bench.synthetic), so the app and the benchmarks can
+run without prism.horse:
+
+    python -m bench.fake_prism --port 8765 --tasks 2000 --latency-ms 80
+    PRISM_BASE_URL=http://127.0.0.1:8765 PRISM_USER=x PRISM_PASS=x flask run
+
+Each (dueDate, trainerIds) gets its own payload, generated once and then
+served from memory; `latency` delays every response, like the real round trip.
+"""
+
+import argparse
+import json
+import secrets
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench.synthetic import make_trackwork_bytes
+
+
+class FakePrism(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, tasks: int = 1000, lots: int = 8, latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.tasks = tasks
+        self.lots = lots
+        self.latency = latency
+        self.tokens: set[str] = set()
+        self.payloads: dict[tuple, bytes] = {}
+        self.stats = {"logins": 0, "trackwork": 0, "unauthorized": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def payload(self, due: str, trainers: str) -> bytes:
+        key = (due, trainers)
+        with self.lock:
+            body = self.payloads.get(key)
+        if body is None:
+            seed = zlib.crc32(f"{due}|{trainers}".encode())
+            body = make_trackwork_bytes(self.tasks, lots=self.lots, seed=seed)
+            with self.lock:
+                self.payloads[key] = body
+        return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real thing
+    # Headers and body go out as separate writes; don't let Nagle hold the body back.
+    disable_nagle_algorithm = True
+    server: FakePrism
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if urlsplit(self.path).path != "/api/login":
+            return self._send(404, b"{}")
+        if not self.headers.get("x-auth-username"):
+            return self._send(401, b"{}")
+
+        time.sleep(self.server.latency)
+        token = secrets.token_hex(16)
+        with self.server.lock:
+            self.server.tokens.add(token)
+            self.server.stats["logins"] += 1
+        self._send(200, json.dumps({"responseCode": 200, "responseData": {"token": token}}).encode())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/api/v2/trackwork":
+            return self._send(404, b"{}")
+        with self.server.lock:
+            authorized = self.headers.get("x-auth-token") in self.server.tokens
+            self.server.stats["trackwork" if authorized else "unauthorized"] += 1
+        if not authorized:
+            return self._send(401, b"{}")
+
+        query = parse_qs(url.query)
+        body = self.server.payload(query.get("dueDate", [""])[0], query.get("trainerIds", [""])[0])
+        time.sleep(self.server.latency)
+        self._send(200, body)
+
+
+def serve(port: int = 0, tasks: int = 1000, lots: int = 8, latency: float = 0.0) -> FakePrism:
+    """Start a FakePrism on 127.0.0.1:port (0 picks a free one) in a background thread."""
+    server = FakePrism(("127.0.0.1", port), tasks=tasks, lots=lots, latency=latency)
+    threading.Thread(target=server.serve_forever, name="fake-prism", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--lots", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakePrism(("127.0.0.1", args.port), tasks=args.tasks, lots=args.lots, latency=args.latency_ms / 1000)
+    print(f"Fake Prism on {server.base_url} ({args.tasks} tasks per day)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
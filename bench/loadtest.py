@@ -0,0 +1,268 @@
+"""
+Load test: a yard full of phones on the box order page, against a local
+instance of the app.
+
+Each simulated phone does what static/box-sync.js does:
+- loads /boxes once
+- then either polls /api/boxes/state?since=<version> every --poll-interval
+  seconds, or holds open /api/boxes/stream (--mode sse)
+- ticks random boxes, sending each tick batch to /api/boxes/state/batch
+
+    python -m bench.loadtest --spawn --phones 50 --duration 60
+    python -m bench.loadtest --url http://127.0.0.1:8080 --pid 1234 --phones 100
+
+With --spawn the app is started the way the Dockerfile runs it (flask run)
+against bench.fake_prism, with a temporary SQLite box-state database. CPU
+and memory are sampled from /proc for the spawned (or --pid) process.
+"""
+
+import argparse
+import math
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from bench import fake_prism
+
+KEY_RE = re.compile(r"data-key='([^']+)'")
+DATE_RE = re.compile(r"data-date='([^']+)'")
+
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.sse_events = 0
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float, ok: bool):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            if not ok:
+                self.errors[kind] += 1
+
+
+class Phone(threading.Thread):
+    def __init__(self, base_url: str, args, results: Results, stop: threading.Event, seed: int):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.args = args
+        self.results = results
+        self.stop_event = stop
+        self.rnd = random.Random(seed)
+        self.session = requests.Session()
+        self.version = 0
+
+    def request(self, kind: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+            ok = resp.status_code in (200, 304)
+        except requests.RequestException:
+            resp, ok = None, False
+        self.results.record(kind, time.perf_counter() - start, ok)
+        return resp if ok else None
+
+    def run(self):
+        # Phones don't all open the page in the same instant.
+        if self.stop_event.wait(self.rnd.uniform(0, self.args.poll_interval)):
+            return
+        page = self.request("page", "GET", "/boxes")
+        if page is None:
+            return
+        keys = KEY_RE.findall(page.text)
+        match = DATE_RE.search(page.text)
+        if not keys or not match:
+            return
+        date = match.group(1)
+        checked = {}
+
+        if self.args.mode == "sse":
+            threading.Thread(target=self.listen, args=(date,), daemon=True).start()
+        next_poll = time.monotonic() if self.args.mode == "poll" else math.inf
+        next_tick = time.monotonic() + self.tick_gap()
+
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_poll:
+                resp = self.request("poll", "GET", "/api/boxes/state", params={"date": date, "since": self.version})
+                if resp is not None and resp.status_code == 200:
+                    self.version = resp.json().get("version", self.version)
+                next_poll = now + self.args.poll_interval
+            if now >= next_tick:
+                # A tick or a few, like a row being ticked off, in one batch.
+                updates = []
+                for key in self.rnd.sample(keys, min(len(keys), self.rnd.randint(1, 3))):
+                    checked[key] = not checked.get(key, False)
+                    updates.append({"key": key, "checked": checked[key]})
+                self.request("toggle", "POST", "/api/boxes/state/batch", json={"date": date, "updates": updates})
+                next_tick = now + self.tick_gap()
+            self.stop_event.wait(max(0.0, min(next_poll, next_tick) - time.monotonic()))
+
+    def tick_gap(self) -> float:
+        if self.args.ticks_per_minute <= 0:
+            return math.inf
+        return self.rnd.expovariate(self.args.ticks_per_minute / 60)
+
+    def listen(self, date: str):
+        start = time.perf_counter()
+        try:
+            with self.session.get(
+                f"{self.base_url}/api/boxes/stream", params={"date": date}, stream=True, timeout=30
+            ) as resp:
+                self.results.record("stream", time.perf_counter() - start, resp.ok)
+                for line in resp.iter_lines():
+                    if self.stop_event.is_set():
+                        return
+                    if line.startswith(b"data:"):
+                        with self.results.lock:
+                            self.results.sse_events += 1
+        except requests.RequestException:
+            if not self.stop_event.is_set():
+                self.results.record("stream", time.perf_counter() - start, False)
+
+
+class ProcessSampler(threading.Thread):
+    """CPU time and resident memory of a process, from /proc, once a second."""
+
+    def __init__(self, pid: int):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.rss_mb: list[float] = []
+        self.cpu_start = self.cpu_seconds()
+        self.started = time.monotonic()
+        self.stop_event = threading.Event()
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+
+    def rss(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return kb / 1024
+
+    def run(self):
+        while not self.stop_event.wait(1):
+            self.rss_mb.append(self.rss())
+
+    def summary(self) -> str:
+        cpu = (self.cpu_seconds() - self.cpu_start) / (time.monotonic() - self.started)
+        rss = self.rss_mb or [self.rss()]
+        return f"server cpu {cpu * 100:.0f}% of one core, rss mean {statistics.mean(rss):.0f} MiB, peak {max(rss):.0f} MiB"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_app(prism: fake_prism.FakePrism) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="arvo-loadtest-")
+    env = {
+        **os.environ,
+        "PRISM_BASE_URL": prism.base_url,
+        "PRISM_USER": "loadtest",
+        "PRISM_PASS": "loadtest",
+        "PREFETCH_ENABLED": "0",
+        "BOX_STATE_DB": os.path.join(workdir, "box_state.db"),
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshot"),
+        "LOG_LEVEL": "WARNING",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(base_url + "/", timeout=1)
+            return proc, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("app didn't start")
+
+
+def report(results: Results, elapsed: float):
+    total = sum(len(v) for v in results.latencies.values())
+    errors = sum(results.errors.values())
+    print(f"{total} requests in {elapsed:.0f}s: {total / elapsed:.1f} req/s, {errors / max(total, 1) * 100:.2f}% errors")
+    print(f"{'kind':<8} {'count':>7} {'req/s':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for kind, times in sorted(results.latencies.items()):
+        times = sorted(times)
+        pct = lambda p: times[math.ceil(len(times) * p) - 1] * 1000  # nearest rank
+        print(
+            f"{kind:<8} {len(times):>7} {len(times) / elapsed:>7.1f} {pct(0.5):>8.1f} {pct(0.9):>8.1f}"
+            f" {pct(0.99):>8.1f} {times[-1] * 1000:>8.1f} {results.errors[kind]:>7}"
+        )
+    if results.sse_events:
+        print(f"sse events received: {results.sse_events}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="an app that's already running")
+    target.add_argument("--spawn", action="store_true", help="start the app and a fake Prism")
+    parser.add_argument("--pid", type=int, help="with --url, the app process to sample CPU/memory of")
+    parser.add_argument("--phones", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--mode", choices=("poll", "sse"), default="poll")
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--ticks-per-minute", type=float, default=6, help="per phone")
+    parser.add_argument("--tasks", type=int, default=1000, help="with --spawn, tasks per synthetic day")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    proc = None
+    if args.spawn:
+        proc, base_url = spawn_app(fake_prism.serve(tasks=args.tasks))
+        pid = proc.pid
+    else:
+        base_url, pid = args.url.rstrip("/"), args.pid
+
+    sampler = ProcessSampler(pid) if pid else None
+    results = Results()
+    stop = threading.Event()
+    phones = [Phone(base_url, args, results, stop, args.seed * 100003 + i) for i in range(args.phones)]
+    print(f"{args.phones} phones ({args.mode}) against {base_url} for {args.duration:.0f}s")
+    try:
+        if sampler:
+            sampler.start()
+        started = time.monotonic()
+        for phone in phones:
+            phone.start()
+        stop.wait(args.duration)
+        stop.set()
+        elapsed = time.monotonic() - started
+        report(results, elapsed)
+        if sampler:
+            print(sampler.summary())
+    finally:
+        stop.set()
+        if sampler:
+            sampler.stop_event.set()
+            sampler.join()
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Peak memory and time of the streaming trackwork decode against the r.json()
+path, on a synthetic payload:
+
+    python -m bench.parse --tasks 20000
+"""
+
+import argparse
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+from requests.models import Response
+
+from arvo_helper import Trackwork, index_trackwork_response
+from bench.synthetic import make_trackwork_bytes
+
+
+def _response(body: bytes) -> Response:
+    r = Response()
+    r.status_code = 200
+    r.raw = io.BytesIO(body)
+    return r
+
+
+def decode_whole(body: bytes) -> Trackwork:
+    r = _response(body)
+    trackwork = Trackwork("", data=r.json())
+    trackwork.index  # both views need it
+    return trackwork
+
+
+def decode_streaming(body: bytes) -> Trackwork:
+    return index_trackwork_response(_response(body))
+
+
+def measure(fn, body: bytes, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn(body)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn(body)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "tasks": len(result.index.tasks),
+        "median_ms": statistics.median(times) * 1000,
+        "peak_mb": peak / 2**20,
+        "retained_mb": retained / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    body = make_trackwork_bytes(args.tasks)
+    print(f"payload: {args.tasks} tasks, {len(body) / 2**20:.1f} MiB")
+    print(f"{'path':<12} {'tasks':>7} {'median ms':>10} {'peak MiB':>9} {'kept MiB':>9}")
+    for name, fn in (("r.json()", decode_whole), ("streaming", decode_streaming)):
+        m = measure(fn, body, args.repeats)
+        print(f"{name:<12} {m['tasks']:>7} {m['median_ms']:>10.1f} {m['peak_mb']:>9.1f} {m['retained_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Times each stage of serving the pages, and the pages themselves, against
+a local fake Prism (bench.fake_prism) instead of prism.horse:
+
+    python -m bench.suite --tasks 2000 --iterations 50
+    python -m bench.suite --only route --latency-ms 80
+
+Reports throughput, p50/p99 latency and peak traced memory per benchmark.
+"/arvo cold" clears the trackwork and page caches first, so it includes the
+Prism round trip; "/arvo warm" is served from them.
+"""
+
+import argparse
+import gc
+import math
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from bench import fake_prism
+
+
+def measure(fn, iterations: int, setup=None) -> dict:
+    """Run fn() `iterations` times (after one warm-up) and once more under tracemalloc."""
+    times = []
+    for i in range(iterations + 1):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        if i:  # the first run warms imports and connections
+            times.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "ops_per_s": len(times) / sum(times),
+        "p50_ms": statistics.median(times) * 1000,
+        "p99_ms": times[math.ceil(len(times) * 0.99) - 1] * 1000,  # nearest rank
+        "peak_mb": peak / 2**20,
+    }
+
+
+def _configure(server: fake_prism.FakePrism):
+    # Read at import by arvo_helper and app, so set before importing them.
+    os.environ["PRISM_BASE_URL"] = server.base_url
+    os.environ.setdefault("PRISM_USER", "bench")
+    os.environ.setdefault("PRISM_PASS", "bench")
+    os.environ["PREFETCH_ENABLED"] = "0"
+    os.environ["BOX_STATE_BACKEND"] = "memory"
+    os.environ["SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="arvo-bench-")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def benchmarks():
+    """(name, fn, setup) for every benchmark."""
+    import arvo_helper
+    import app
+
+    # Disk snapshots would be read on misses and written after every load.
+    arvo_helper.TRACKWORK_CACHE.seeder = None
+    arvo_helper.TRACKWORK_CACHE.listeners.clear()
+
+    day = arvo_helper.melbourne_today()
+    session = arvo_helper.get_prism_session()
+    data = arvo_helper.fetch_trackwork(session, day)
+    index = arvo_helper.TrackworkIndex.from_payload(data)
+    barns = arvo_helper.group_by_barn(index)
+    client = app.app.test_client()
+
+    def clear_caches():
+        with arvo_helper.TRACKWORK_CACHE._lock:
+            arvo_helper.TRACKWORK_CACHE._entries.clear()
+        with arvo_helper._page_lock:
+            arvo_helper._page_cache.clear()
+
+    def get(path):
+        def run():
+            resp = client.get(path, headers={"Accept-Encoding": "gzip"})
+            resp.get_data()
+            assert resp.status_code == 200, resp.status_code
+
+        return run
+
+    return [
+        ("prism_login", lambda: arvo_helper.prism_login(os.environ["PRISM_USER"], os.environ["PRISM_PASS"]), None),
+        ("fetch_trackwork", lambda: arvo_helper.fetch_trackwork(session, day), None),
+        ("index build", lambda: arvo_helper.TrackworkIndex.from_payload(data), None),
+        ("group_by_barn", lambda: arvo_helper.group_by_barn(index), None),
+        ("barns_to_html", lambda: arvo_helper.barns_to_html(barns), None),
+        ("box_order_to_html", lambda: arvo_helper.box_order_to_html(index, day), None),
+        ("route /arvo cold", get("/arvo"), clear_caches),
+        ("route /arvo warm", get("/arvo"), None),
+        ("route /boxes cold", get("/boxes"), clear_caches),
+        ("route /boxes warm", get("/boxes"), None),
+        ("route /api/boxes cold", get("/api/boxes"), clear_caches),
+        ("route /api/boxes warm", get("/api/boxes"), None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000, help="tasks per synthetic day")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake Prism response")
+    parser.add_argument("--only", default="", help="run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    server = fake_prism.serve(tasks=args.tasks, latency=args.latency_ms / 1000)
+    _configure(server)
+
+    print(f"fake Prism: {server.base_url}, {args.tasks} tasks/day, +{args.latency_ms:.0f} ms")
+    print(f"{'benchmark':<22} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak MiB':>9}")
+    for name, fn, setup in benchmarks():
+        if args.only not in name:
+            continue
+        m = measure(fn, args.iterations, setup)
+        print(f"{name:<22} {m['ops_per_s']:>9.1f} {m['p50_ms']:>9.2f} {m['p99_ms']:>9.2f} {m['peak_mb']:>9.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic Prism trackwork payloads shaped like /api/v2/trackwork/ responses:
+lot header tasks ('Lot N 4:45') with child tasks pointing at them through a
+numeric groupName, treadmill tasks, otherWorks labels, and the bulky fields
+Prism sends that the views never read.
+"""
+
+import json
+import random
+
+BARNS = ("Barn A", "Barn B", "Barn C", "Barn D", "Spelling Paddocks")
+LABELS = ("Trot Up PM", "Swim 1 PM", "Walker PM", "Ice Legs", "Spell")
+
+
+def _task(rnd: random.Random, task_id: int, group_name: str, barn: str) -> dict:
+    labels = rnd.sample(LABELS, rnd.randint(0, 2))
+    horse = f"Horse {task_id}"
+    return {
+        "id": task_id,
+        "groupName": group_name,
+        "horseName": horse,
+        "horse": {"id": 500000 + task_id, "name": horse, "sire": "Sire", "dam": "Dam", "foaled": 2021},
+        "barnName": barn,
+        "barn": {"id": BARNS.index(barn) + 1, "name": barn},
+        "boxName": str(rnd.randint(1, 120)),
+        "boxInfo": {"id": task_id, "name": None},
+        "otherWorks": [{"id": rnd.randint(1, 99), "label": label, "colour": "#f58220"} for label in labels],
+        "otherWorksString": "",
+        "riderName": rnd.choice(["J. Smith", "A. Nguyen", "K. Brown", ""]),
+        "workType": rnd.choice(["Canter", "Gallop", "Pace work", "Jog"]),
+        "distance": rnd.choice([800, 1000, 1200, 1600]),
+        "dueDate": 1760000000000,
+        "notes": "Routine trackwork. " * rnd.randint(0, 4),
+        "createdAt": "2025-11-24T04:51:13Z",
+        "updatedAt": "2025-11-24T04:51:13Z",
+    }
+
+
+def make_trackwork(n_tasks: int = 1000, lots: int = 8, treadmill_share: float = 0.05, seed: int = 0) -> dict:
+    """A payload with about n_tasks tasks spread across `lots` lots and some treadmills."""
+    rnd = random.Random(seed)
+    tasks = []
+    next_id = 1
+    treadmills = int(n_tasks * treadmill_share)
+    per_lot = max((n_tasks - treadmills) // lots - 1, 0)
+
+    for lot in range(1, lots + 1):
+        parent_id = next_id
+        tasks.append(_task(rnd, parent_id, f"Lot {lot} {4 + lot // 4}:{15 * (lot % 4):02d}", rnd.choice(BARNS)))
+        next_id += 1
+        for _ in range(per_lot):
+            tasks.append(_task(rnd, next_id, str(parent_id), rnd.choice(BARNS)))
+            next_id += 1
+
+    for _ in range(treadmills):
+        tasks.append(_task(rnd, next_id, "Treadmill 7:30", rnd.choice(BARNS)))
+        next_id += 1
+
+    rnd.shuffle(tasks)
+    return {"responseCode": 200, "responseMessage": "OK", "responseData": {"tasks": tasks}}
+
+
+def make_trackwork_bytes(n_tasks: int = 1000, **kwargs) -> bytes:
+    return json.dumps(make_trackwork(n_tasks, **kwargs)).encode()
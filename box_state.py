@@ -0,0 +1,414 @@
+"""
+Checkbox state for the box-order (muck out) page.
+
+Reads are served from a hot in-memory copy per date, loaded lazily from a
+persistence backend on first access. Writes update the hot copy, fan out to
+open streams and are handed to the backend, which persists them without
+making the request wait on the disk.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as Date, timedelta
+
+from arvo_helper import melbourne_today
+from metrics import Counter
+
+log = logging.getLogger(__name__)
+
+# Melbourne days either side of today that can be read or written. Older days
+# are evicted from memory (persistent backends keep them on disk).
+RETAIN_DAYS = int(os.environ.get("BOX_STATE_RETAIN_DAYS", "7"))
+AHEAD_DAYS = int(os.environ.get("BOX_STATE_AHEAD_DAYS", "14"))
+MAX_KEYS_PER_DATE = int(os.environ.get("BOX_STATE_MAX_KEYS", "2000"))
+MAX_KEY_LENGTH = 200
+
+
+BOX_STATE_WRITES = Counter("arvo_box_state_writes_total", "Box state changes applied (one per POST or batch).")
+BOX_STATE_KEYS_WRITTEN = Counter("arvo_box_state_keys_written_total", "Checkbox keys written across all changes.")
+
+
+class BoxStateError(ValueError):
+    """A request the store refuses: bad or out-of-range date, bad key, too many keys."""
+
+
+class DayState:
+    """Checkbox state for one date, versioned so clients can ask for changes only."""
+
+    __slots__ = ("version", "values", "changed")
+
+    def __init__(self):
+        self.version = 0
+        self.values: dict[str, bool] = {}
+        # key -> version it last changed at, oldest change first
+        self.changed: OrderedDict[str, int] = OrderedDict()
+
+    def apply(self, updates: dict[str, bool], version: int):
+        self.version = version
+        for key, checked in updates.items():
+            self.values[key] = checked
+            self.changed[key] = version
+            self.changed.move_to_end(key)
+
+    def changes_since(self, since: int) -> dict[str, bool]:
+        """Keys changed after version `since`; walks only the changes, newest first."""
+        changes = {}
+        for key in reversed(self.changed):
+            if self.changed[key] <= since:
+                break
+            changes[key] = self.values[key]
+        return changes
+
+    def delta(self, since: int | None):
+        """
+        (changes, full) for a client that last saw version `since`, or None if
+        it is up to date. No `since`, or one ahead of us, gets the full map.
+        """
+        if since is None or since > self.version:
+            return dict(self.values), True
+        if since == self.version:
+            return None
+        return self.changes_since(since), False
+
+
+# ---------------------------
+# BACKENDS
+# ---------------------------
+
+
+class MemoryBackend:
+    """Keeps nothing: state lives only as long as the process."""
+
+    shared = False
+
+    def load(self, date: str, since: int = 0) -> list[tuple[str, bool, int]]:
+        return []
+
+    def write(self, date: str, updates: dict[str, bool], version: int):
+        pass
+
+    def flush(self):
+        pass
+
+
+class _SQLiteBase:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS box_state (
+            date TEXT NOT NULL,
+            key TEXT NOT NULL,
+            checked INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (date, key)
+        )
+    """
+
+    UPSERT = """
+        INSERT INTO box_state (date, key, checked, version) VALUES (?, ?, ?, ?)
+        ON CONFLICT (date, key) DO UPDATE SET checked = excluded.checked, version = excluded.version
+    """
+
+    # Set on backends whose database other processes write to as well.
+    shared = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader = self._connect()
+        self._reader.execute(self.SCHEMA)
+        self._reader_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, date: str, since: int = 0) -> list[tuple[str, bool, int]]:
+        """(key, checked, version) rows changed after `since`, oldest first."""
+        with self._reader_lock:
+            rows = self._reader.execute(
+                "SELECT key, checked, version FROM box_state WHERE date = ? AND version > ? ORDER BY version",
+                (date, since),
+            ).fetchall()
+        return [(key, bool(checked), version) for key, checked, version in rows]
+
+
+class SQLiteBackend(_SQLiteBase):
+    """
+    SQLite database in WAL mode, owned by this process.
+
+    write() only queues; a single writer thread drains everything queued since
+    its last commit into one transaction, so a burst of ticks becomes one group
+    commit and no request waits on an fsync.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="box-state-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def write(self, date: str, updates: dict[str, bool], version: int):
+        self._queue.put((date, updates, version))
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        self._queue.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [
+                (date, key, int(checked), version)
+                for date, updates, version in batch
+                for key, checked in updates.items()
+            ]
+            try:
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany(self.UPSERT, rows)
+            except sqlite3.Error:
+                log.exception("Failed to persist %d box state writes", len(rows))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+class SharedSQLiteBackend(_SQLiteBase):
+    """
+    SQLite database in WAL mode shared by every worker process on the machine.
+
+    The database is the source of truth for versions: commit() takes SQLite's
+    write lock, allocates the next version for the date and writes in the same
+    transaction, so workers never hand out the same version twice. Commits
+    don't fsync (WAL + synchronous=NORMAL). A watcher thread polls
+    PRAGMA data_version and calls on_change() when another process has
+    written, so each worker can fan the changes out to its own streams.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, poll_interval: float = 0.2):
+        super().__init__(path)
+        self.poll_interval = poll_interval
+        self.on_change = None
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+        self._watcher = threading.Thread(target=self._watch_loop, name="box-state-watcher", daemon=True)
+        self._watcher.start()
+
+    def commit(self, date: str, updates: dict[str, bool], known_version: int):
+        """
+        Write updates as the date's next version. Returns (version, missed),
+        missed being rows other processes wrote after `known_version`.
+        """
+        with self._writer_lock, self._writer as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            missed = conn.execute(
+                "SELECT key, checked, version FROM box_state WHERE date = ? AND version > ? ORDER BY version",
+                (date, known_version),
+            ).fetchall()
+            (current,) = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM box_state WHERE date = ?", (date,)
+            ).fetchone()
+            version = current + 1
+            conn.executemany(
+                self.UPSERT,
+                [(date, key, int(checked), version) for key, checked in updates.items()],
+            )
+        return version, [(key, bool(checked), v) for key, checked, v in missed]
+
+    def flush(self):
+        pass
+
+    def _watch_loop(self):
+        conn = self._connect()
+        (seen,) = conn.execute("PRAGMA data_version").fetchone()
+        while True:
+            time.sleep(self.poll_interval)
+            # data_version only moves when *another* connection commits.
+            (current,) = conn.execute("PRAGMA data_version").fetchone()
+            if current != seen and self.on_change is not None:
+                seen = current
+                try:
+                    self.on_change()
+                except Exception:
+                    log.exception("Failed to sync box state from other workers")
+
+
+def backend_from_env():
+    """
+    BOX_STATE_BACKEND picks the backend:
+      - sqlite (default): one process owns BOX_STATE_DB, writes batched in the background
+      - shared: every worker process on the machine shares BOX_STATE_DB
+      - memory: nothing persisted
+    """
+    kind = os.environ.get("BOX_STATE_BACKEND", "sqlite")
+    path = os.environ.get("BOX_STATE_DB", "box_state.db")
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    if kind == "shared":
+        return SharedSQLiteBackend(path)
+    raise ValueError(f"Unknown BOX_STATE_BACKEND: {kind!r}")
+
+
+# ---------------------------
+# STORE
+# ---------------------------
+
+
+class BoxStateStore:
+    """
+    Hot in-memory copy of box state per date, plus the open streams to notify.
+
+    One lock guards both, so a stream's snapshot and the changes published
+    after it line up exactly. Only dates within RETAIN_DAYS before and
+    AHEAD_DAYS after today are held, each capped at MAX_KEYS_PER_DATE keys,
+    so memory stays bounded however long the process runs. With a shared
+    backend, changes other worker processes make are pulled in by sync() and
+    published like local ones.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._days: dict[str, DayState] = {}
+        # Open /api/boxes/stream connections, one queue each
+        self._subscribers: dict[str, list[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        if backend.shared:
+            backend.on_change = self.sync
+
+    def _day(self, date: str) -> DayState:
+        # Caller holds self._lock.
+        day = self._days.get(date)
+        if day is None:
+            self._evict()
+            day = DayState()
+            self._apply_rows(date, day, self.backend.load(date), publish=False)
+            self._days[date] = day
+        return day
+
+    def _evict(self):
+        # Caller holds self._lock. Drops days that have left the retention window.
+        oldest = (melbourne_today() - timedelta(days=RETAIN_DAYS)).isoformat()
+        for date in [d for d in self._days if d < oldest]:
+            del self._days[date]
+
+    @staticmethod
+    def check_date(date: str):
+        """Only YYYY-MM-DD dates inside the retention window are accepted."""
+        try:
+            # fromisoformat alone would also take "20250101" and other ISO forms
+            if len(date) != 10:
+                raise ValueError
+            day = Date.fromisoformat(date)
+        except (TypeError, ValueError):
+            raise BoxStateError(f"invalid date {date!r}, expected YYYY-MM-DD") from None
+        today = melbourne_today()
+        if not today - timedelta(days=RETAIN_DAYS) <= day <= today + timedelta(days=AHEAD_DAYS):
+            raise BoxStateError(f"date {date} is outside the kept range")
+
+    @staticmethod
+    def _check_updates(day: DayState, updates: dict[str, bool]):
+        new_keys = 0
+        for key in updates:
+            if not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH:
+                raise BoxStateError(f"keys must be non-empty strings of at most {MAX_KEY_LENGTH} characters")
+            if key not in day.values:
+                new_keys += 1
+        if len(day.values) + new_keys > MAX_KEYS_PER_DATE:
+            raise BoxStateError(f"at most {MAX_KEYS_PER_DATE} keys per date")
+
+    def _apply_rows(self, date: str, day: DayState, rows, publish: bool = True):
+        # Caller holds self._lock. Rows are (key, checked, version), oldest first.
+        i = 0
+        while i < len(rows):
+            version = rows[i][2]
+            updates = {}
+            while i < len(rows) and rows[i][2] == version:
+                updates[rows[i][0]] = rows[i][1]
+                i += 1
+            day.apply(updates, version)
+            if publish:
+                self._publish(date, version, updates)
+
+    def _publish(self, date: str, version: int, updates: dict[str, bool]):
+        # Caller holds self._lock.
+        for q in self._subscribers.get(date, ()):
+            q.put((date, version, updates))
+
+    def get(self, date: str, since: int | None = None):
+        """(version, delta) where delta is as DayState.delta()."""
+        self.check_date(date)
+        with self._lock:
+            day = self._day(date)
+            return day.version, day.delta(since)
+
+    def set_many(self, date: str, updates: dict[str, bool]) -> int:
+        """Apply updates as one change, persist and publish them; returns the new version."""
+        self.check_date(date)
+        with self._lock:
+            day = self._day(date)
+            self._check_updates(day, updates)
+            if self.backend.shared:
+                version, missed = self.backend.commit(date, updates, day.version)
+                self._apply_rows(date, day, missed)
+            else:
+                version = day.version + 1
+                self.backend.write(date, updates, version)
+            day.apply(updates, version)
+            self._publish(date, version, updates)
+        BOX_STATE_WRITES.inc()
+        BOX_STATE_KEYS_WRITTEN.inc(amount=len(updates))
+        return version
+
+    def sync(self):
+        """Pull in changes other processes made to the dates we hold."""
+        with self._lock:
+            for date, day in self._days.items():
+                self._apply_rows(date, day, self.backend.load(date, since=day.version))
+
+    def subscribe(self, date: str, since: int | None = None, q: queue.Queue | None = None):
+        """
+        Register a queue (`q`, or a new one) that receives (date, version, changes)
+        for every later update. One queue may be subscribed to several dates.
+        Returns (queue, version, delta) where delta catches the caller up to version.
+        """
+        self.check_date(date)
+        if q is None:
+            q = queue.Queue()
+        with self._lock:
+            day = self._day(date)
+            self._subscribers.setdefault(date, []).append(q)
+            return q, day.version, day.delta(since)
+
+    def unsubscribe(self, date: str, q: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(date, [])
+            if q in subscribers:
+                subscribers.remove(q)
+            if not subscribers:
+                self._subscribers.pop(date, None)
+
+    def snapshot_stats(self) -> dict:
+        """Dates held in memory, and open streams per date."""
+        with self._lock:
+            return {
+                "dates": len(self._days),
+                "streams": {date: len(qs) for date, qs in self._subscribers.items()},
+            }
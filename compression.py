@@ -0,0 +1,66 @@
+"""
+Response compression: Content-Encoding negotiation, one-shot compression of
+whole bodies and incremental gzip for streamed pages.
+"""
+
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; without it only gzip is offered
+    brotli = None
+
+# Preferred first; "identity" is always acceptable.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Bodies smaller than this go out uncompressed; small /api/boxes/state
+# replies would gain nothing but CPU time.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+}
+
+
+def choose_encoding(accept_encodings, available=ENCODINGS) -> str:
+    """Best of `available` for a request's Accept-Encoding, else "identity"."""
+    return accept_encodings.best_match(list(available), default="identity") or "identity"
+
+
+# Levels for bodies compressed on every request (fast=True): a fraction of
+# the CPU of the best levels for a few percent more bytes.
+FAST_GZIP_LEVEL = 6
+FAST_BROTLI_QUALITY = 5
+
+
+def compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    """
+    Compress a whole body. By default at the best level, for callers that
+    compress once and cache the result; with fast=True at a cheaper level,
+    for bodies compressed afresh on every request.
+    """
+    if encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.compress(body, FAST_GZIP_LEVEL if fast else 9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=FAST_BROTLI_QUALITY if fast else 11)
+    raise ValueError(f"Unsupported encoding: {encoding!r}")
+
+
+def gzip_stream(chunks):
+    """
+    Gzip a stream of text chunks, flushing after each one so the client can
+    render every chunk as soon as it arrives.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,196 @@
+"""
+In-process metrics, served in the Prometheus text format at /metrics.
+
+Counters and histograms are plain dicts behind a lock, keyed by label values,
+so recording one costs a dict lookup and an add. Values other modules already
+keep (cache stats, box-state dates) are read at scrape time by callbacks.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+# Seconds; spans a cached page (sub-ms) to a slow Prism round trip.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, e.g. Counter("x_total", "...", ("kind",)).inc("timeout")."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Histogram:
+    """Distribution of observed values (seconds, by default) in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def lines(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labelvalues, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}"
+
+
+class Timer:
+    """
+    Observes wall time into a histogram, as a context manager or, applied to
+    a function, for every call of it.
+    """
+
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram: Histogram, labelvalues: tuple):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with type(self)(self.histogram, self.labelvalues):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+class Callback:
+    """
+    A value read when /metrics is scraped. fn() returns a number, or a dict of
+    {label value: number} when `labelname` is given.
+    """
+
+    def __init__(self, name: str, help: str, fn, type: str = "gauge", labelname: str | None = None):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.fn = fn
+        self.labelname = labelname
+        REGISTRY.append(self)
+
+    def lines(self):
+        value = self.fn()
+        if self.labelname is None:
+            yield f"{self.name} {_number(value)}"
+            return
+        for labelvalue, v in sorted(value.items()):
+            yield f"{self.name}{_labels((self.labelname,), (labelvalue,))} {_number(v)}"
+
+
+# Where a request's time goes: Prism login/fetch/decode, grouping and rendering.
+STAGE_SECONDS = Histogram("arvo_stage_duration_seconds", "Time spent in each stage of serving a page.", ("stage",))
+
+# Per-thread list of (stage, seconds) for the request being traced, if any.
+_trace = threading.local()
+
+
+class StageTimer(Timer):
+    """A stage Timer that also adds its duration to the current thread's trace."""
+
+    __slots__ = ()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.histogram.observe(elapsed, *self.labelvalues)
+        stages = getattr(_trace, "stages", None)
+        if stages is not None:
+            stages.append((self.labelvalues[0], elapsed))
+        return False
+
+
+def timed(stage: str) -> StageTimer:
+    """`with timed("login"):` or `@timed("group_by_barn")` records durations under that stage."""
+    return StageTimer(STAGE_SECONDS, (stage,))
+
+
+def start_trace():
+    """Collect this thread's stage timings from now until end_trace()."""
+    _trace.stages = []
+
+
+def end_trace() -> list[tuple[str, float]]:
+    stages = getattr(_trace, "stages", None) or []
+    _trace.stages = None
+    return stages
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    out = []
+    for metric in REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.type}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
@@ -0,0 +1,89 @@
+"""
+Background prefetch aligned to the stable's day.
+
+A daemon thread keeps today's trackwork and rendered pages warm, so the
+first person to open /arvo or /boxes doesn't pay for the Prism round trip:
+
+  - at each PREFETCH_SHIFT_TIMES (shortly before morning and afternoon shifts)
+  - every PREFETCH_INTERVAL_MINUTES in between
+  - from PREFETCH_TOMORROW_AFTER on, tomorrow's schedule as well
+
+All times are Melbourne local, "HH:MM", comma separated.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, time, timedelta
+
+from arvo_helper import MEL_TZ, warm_day
+
+log = logging.getLogger(__name__)
+
+
+def _parse_times(value: str) -> list[time]:
+    return sorted(time.fromisoformat(t.strip()) for t in value.split(",") if t.strip())
+
+
+class PrefetchScheduler:
+    def __init__(self, shift_times: list[time], tomorrow_after: time, interval: timedelta, warm=warm_day):
+        self.shift_times = shift_times
+        self.tomorrow_after = tomorrow_after
+        self.interval = interval
+        self.warm = warm
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_run(self, now: datetime, last_run: datetime | None) -> datetime:
+        """Earliest of: the next anchor time (shift or tomorrow's publish time), the next interval."""
+        anchors = []
+        for day in (now.date(), now.date() + timedelta(days=1)):
+            for t in (*self.shift_times, self.tomorrow_after):
+                anchors.append(datetime.combine(day, t, tzinfo=MEL_TZ))
+        candidates = [a for a in anchors if a > now]
+        candidates.append(now if last_run is None else last_run + self.interval)
+        return min(candidates)
+
+    def days_to_warm(self, now: datetime) -> list:
+        days = [now.date()]
+        if now.timetz().replace(tzinfo=None) >= self.tomorrow_after:
+            days.append(now.date() + timedelta(days=1))
+        return days
+
+    def run_once(self, now: datetime):
+        for day in self.days_to_warm(now):
+            try:
+                self.warm(day)
+            except Exception:
+                log.exception("Prefetch of %s failed", day)
+
+    def _loop(self):
+        last_run = None
+        while not self._stop.is_set():
+            now = datetime.now(MEL_TZ)
+            due = self.next_run(now, last_run)
+            if self._stop.wait(max((due - now).total_seconds(), 0)):
+                return
+            now = datetime.now(MEL_TZ)
+            self.run_once(now)
+            last_run = now
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_from_env() -> PrefetchScheduler | None:
+    """Start the scheduler unless PREFETCH_ENABLED=0."""
+    if os.environ.get("PREFETCH_ENABLED", "1") != "1":
+        return None
+    scheduler = PrefetchScheduler(
+        shift_times=_parse_times(os.environ.get("PREFETCH_SHIFT_TIMES", "04:15,12:45")),
+        tomorrow_after=time.fromisoformat(os.environ.get("PREFETCH_TOMORROW_AFTER", "16:00")),
+        interval=timedelta(minutes=float(os.environ.get("PREFETCH_INTERVAL_MINUTES", "15"))),
+    )
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,148 @@
+"""
+On-demand profiling of single requests, and a log of slow ones.
+
+Profiling is off unless PROFILE_TOKEN is set. A request to one of the
+PROFILED_ENDPOINTS carrying that token in an X-Profile-Token header (never
+the query string, which access logs record) runs under cProfile. Instead of
+the page it gets back a plain-text report: its stage timings and the top
+functions by cumulative time. With PROFILE_DIR set, the raw .prof file is
+kept there as well, for snakeviz or pstats.
+
+Every request slower than SLOW_REQUEST_SECONDS is logged with its stage
+timings (see metrics.timed), streamed bodies included; event streams
+(UNTIMED_ENDPOINTS) are left out.
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from flask import Response, g, request
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+# Functions listed in a profile report.
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "30"))
+# 0 turns the slow-request log off.
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "2"))
+
+# The page views and the box-state API; never the endless event stream.
+PROFILED_ENDPOINTS = {
+    "arvo",
+    "boxes",
+    "arvo_data",
+    "boxes_data",
+    "get_boxes_state",
+    "update_boxes_state",
+    "update_boxes_state_batch",
+}
+
+# Open for as long as the client stays connected, so always "slow".
+UNTIMED_ENDPOINTS = {"stream_boxes_state"}
+
+# cProfile can't run two profilers at once; a second request goes unprofiled.
+_profile_lock = threading.Lock()
+
+
+def _token_ok() -> bool:
+    token = request.headers.get("X-Profile-Token")
+    # Compared as bytes: compare_digest rejects non-ASCII str.
+    return bool(PROFILE_TOKEN and token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def _start_profile():
+    if request.endpoint not in PROFILED_ENDPOINTS or not _token_ok():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        log.warning("Profile requested for %s while another is running; skipped", request.path)
+        return
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _report(profiler: cProfile.Profile, resp: Response, elapsed: float, stages) -> str:
+    out = io.StringIO()
+    out.write(f"{request.method} {request.full_path.rstrip('?')} -> {resp.status_code} in {elapsed * 1000:.1f} ms\n\n")
+    for stage, seconds in stages:
+        out.write(f"  {stage:<20} {seconds * 1000:9.1f} ms\n")
+    out.write("\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return out.getvalue()
+
+
+def _finish_profile(resp: Response) -> Response:
+    profiler = g.pop("profiler")
+    try:
+        # A streamed page renders while it's sent; render it now, under the profiler.
+        resp.get_data()
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+
+    elapsed = time.perf_counter() - g.started
+    report = _report(profiler, resp, elapsed, metrics.end_trace())
+    if PROFILE_DIR:
+        path = Path(PROFILE_DIR) / f"{request.endpoint}-{datetime.now():%Y%m%dT%H%M%S.%f}.prof"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+        log.info("Saved profile of %s to %s", request.path, path)
+
+    profiled = Response(report, mimetype="text/plain")
+    profiled.headers["Cache-Control"] = "no-store"
+    profiled.headers["X-Profiled-Status"] = str(resp.status_code)
+    return profiled
+
+
+def _log_if_slow(resp: Response) -> Response:
+    started = g.started
+    method, path = request.method, request.full_path.rstrip("?")
+
+    def check():
+        # Runs once the body is sent, so streamed pages count in full.
+        elapsed = time.perf_counter() - started
+        stages = metrics.end_trace()
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            timings = ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in stages)
+            log.warning("Slow request %s %s: %.0f ms (%s)", method, path, elapsed * 1000, timings or "no stages")
+
+    resp.call_on_close(check)
+    return resp
+
+
+def install(app):
+    """Register the profiling and slow-request hooks on `app`."""
+
+    # Both rely on the app's own before_request hook having set g.started
+    # and started the stage trace.
+    @app.before_request
+    def start_profile():
+        if PROFILE_TOKEN:
+            _start_profile()
+
+    @app.after_request
+    def finish(resp: Response) -> Response:
+        if "profiler" in g:
+            return _finish_profile(resp)
+        if SLOW_REQUEST_SECONDS > 0 and request.endpoint not in UNTIMED_ENDPOINTS:
+            return _log_if_slow(resp)
+        return resp
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # The view raised, so finish() never ran.
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
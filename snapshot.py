@@ -0,0 +1,153 @@
+"""
+On-disk snapshot of the last good trackwork and rendered pages, so a
+machine that was scaled to zero can answer its first request without
+waiting on Prism.
+
+After every successful Prism load the trackwork's index and both rendered
+views are written to SNAPSHOT_DIR. After a restart, the first request for a
+(trainer, date) the cache doesn't hold loads that file instead. It is
+served marked as a snapshot (possibly stale) while the cache refreshes it
+from Prism in the background.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from arvo_helper import (
+    PAGE_STREAMERS,
+    RENDER_VERSION,
+    TRACKWORK_CACHE,
+    TRAINERS,
+    TaskRecord,
+    Trackwork,
+    TrackworkIndex,
+    get_page,
+    melbourne_today,
+    seed_page,
+)
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get("SNAPSHOT_DIR", "snapshot"))
+# Snapshots for days older than this are deleted when a new one is written.
+SNAPSHOT_KEEP_DAYS = 2
+
+
+def _path(trainer_id: int, dt: date) -> Path:
+    return SNAPSHOT_DIR / f"trackwork-{trainer_id}-{dt.isoformat()}.json"
+
+
+def _pages(trainer_id: int, dt: date, trackwork: Trackwork) -> dict[str, str]:
+    # A page covers every trainer; one trainer's snapshot can only stand in
+    # for it when that's the only trainer.
+    if list(TRAINERS) != [trainer_id]:
+        return {}
+    return {view: get_page(view, dt, {trainer_id: trackwork}).html for view in PAGE_STREAMERS}
+
+
+# path -> (digest, render_version) of the snapshot last read or written there,
+# so a reload of an unchanged payload doesn't rewrite it.
+_saved: dict[Path, tuple[str, str]] = {}
+_saved_lock = threading.Lock()
+
+
+def _on_disk(path: Path) -> tuple[str, str] | None:
+    with _saved_lock:
+        saved = _saved.get(path)
+    if saved is None:
+        try:
+            snapshot = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        saved = (snapshot.get("digest"), snapshot.get("render_version"))
+        with _saved_lock:
+            _saved[path] = saved
+    return saved
+
+
+def save(trainer_id: int, dt: date, trackwork: Trackwork):
+    """
+    Write trackwork and its rendered views atomically (unique temp file +
+    rename), unless the snapshot on disk already holds this payload.
+    """
+    path = _path(trainer_id, dt)
+    saved = (trackwork.digest, RENDER_VERSION)
+    if _on_disk(path) == saved:
+        return
+
+    snapshot = {
+        "trainer_id": trainer_id,
+        "date": dt.isoformat(),
+        "digest": trackwork.digest,
+        "saved_at": time.time(),
+        "render_version": RENDER_VERSION,
+        "tasks": [task.to_row() for task in trackwork.index.tasks],
+        "pages": _pages(trainer_id, dt, trackwork),
+    }
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    # Writer threads, and other processes sharing SNAPSHOT_DIR, each get their own temp file.
+    with tempfile.NamedTemporaryFile(
+        "w", dir=SNAPSHOT_DIR, prefix=f"{path.stem}-", suffix=".tmp", delete=False
+    ) as tmp:
+        try:
+            tmp.write(json.dumps(snapshot, separators=(",", ":")))
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, path)
+    with _saved_lock:
+        _saved[path] = saved
+    _prune()
+
+
+def _prune():
+    oldest = (melbourne_today() - timedelta(days=SNAPSHOT_KEEP_DAYS)).isoformat()
+    for path in SNAPSHOT_DIR.glob("trackwork-*.json"):
+        day = "-".join(path.stem.split("-")[-3:])
+        if day < oldest:
+            path.unlink(missing_ok=True)
+            with _saved_lock:
+                _saved.pop(path, None)
+
+
+def load(trainer_id: int, dt: date) -> Trackwork | None:
+    """Trackwork from the snapshot for (trainer, date), or None if there isn't one."""
+    path = _path(trainer_id, dt)
+    try:
+        snapshot = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+
+    with _saved_lock:
+        _saved[path] = (snapshot["digest"], snapshot.get("render_version"))
+    index = TrackworkIndex([TaskRecord.from_row(row) for row in snapshot["tasks"]])
+    trackwork = Trackwork(snapshot["digest"], index=index, source="snapshot")
+    # Pages rendered by different code would carry the wrong markup.
+    if snapshot.get("render_version") == RENDER_VERSION:
+        for view, html in snapshot["pages"].items():
+            seed_page(view, dt, {trainer_id: trackwork}, html)
+    log.info("Loaded trackwork snapshot %s, saved %.0fs ago", path.name, time.time() - snapshot["saved_at"])
+    return trackwork
+
+
+def _save_in_background(trainer_id: int, dt: date, trackwork: Trackwork):
+    def run():
+        try:
+            save(trainer_id, dt, trackwork)
+        except Exception:
+            log.exception("Failed to write trackwork snapshot for %s %s", trainer_id, dt)
+
+    threading.Thread(target=run, name="snapshot-writer", daemon=True).start()
+
+
+def install(cache=TRACKWORK_CACHE):
+    """Seed `cache` from snapshots on misses and snapshot every fresh load."""
+    cache.seeder = load
+    cache.listeners.append(_save_in_background)
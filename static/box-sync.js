@@ -0,0 +1,132 @@
+// Real-time checkbox sync for the box order page: pushed over SSE, polling
+// only while the stream is down; local ticks are batched before sending.
+// Every element with a data-date (the body for one day, a div.day per day in
+// a multi-day view) syncs the checkboxes inside it as that date's state.
+(function() {
+  const days = new Map();
+  document.querySelectorAll('[data-date]').forEach(el => {
+    const checkboxes = Array.from(el.querySelectorAll('.box-check'));
+    days.set(el.getAttribute('data-date'), {
+      checkboxes: checkboxes,
+      byKey: new Map(checkboxes.map(cb => [cb.dataset.key, cb])),
+      version: 0,
+      // Ticks not yet sent: key -> checked.
+      pending: new Map(),
+      flushTimer: null
+    });
+  });
+  const dates = Array.from(days.keys());
+  if (!dates.length) return;
+
+  // msg is { version, changes: { key: checked } }; only changed keys are touched.
+  function applyState(date, msg) {
+    const day = days.get(date);
+    if (!day) return;
+    Object.entries(msg.changes).forEach(([key, checked]) => {
+      const cb = day.byKey.get(key);
+      // Local ticks still waiting to be sent win over server state.
+      if (cb && !day.pending.has(key)) cb.checked = !!checked;
+    });
+    day.version = msg.version;
+  }
+
+  function fetchState(date) {
+    const since = days.get(date).version;
+    fetch(`/api/boxes/state?date=${encodeURIComponent(date)}&since=${since}`)
+      .then(r => (r.status === 304 ? null : r.json()))
+      .then(msg => msg && applyState(date, msg))
+      .catch(console.error);
+  }
+
+  let pollTimer = null;
+
+  function pollAll() {
+    dates.forEach(fetchState);
+  }
+
+  function startPolling() {
+    if (pollTimer) return;
+    pollAll();
+    pollTimer = setInterval(pollAll, 5000);
+  }
+
+  function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+  }
+
+  // One stream for every date: the server pushes each date's state on
+  // connect, then only changed keys, each event tagged with its date.
+  // EventSource reconnects by itself; poll every 5 seconds until it does.
+  if (window.EventSource) {
+    const query = dates.map(date => `date=${encodeURIComponent(date)}`).join('&');
+    const source = new EventSource(`/api/boxes/stream?${query}`);
+    source.onmessage = e => {
+      const msg = JSON.parse(e.data);
+      applyState(msg.date || dates[0], msg);
+    };
+    source.onopen = stopPolling;
+    source.onerror = startPolling;
+  } else {
+    startPolling();
+  }
+
+  // Changes are coalesced for a moment and sent as one batch per date, so
+  // ticking a whole lot row is a single request.
+  function takeBatch(date) {
+    const day = days.get(date);
+    const updates = Array.from(day.pending, ([key, checked]) => ({ key, checked }));
+    day.pending.clear();
+    clearTimeout(day.flushTimer);
+    day.flushTimer = null;
+    return JSON.stringify({ date: date, updates: updates });
+  }
+
+  function flush(date) {
+    const day = days.get(date);
+    if (!day.pending.size) return;
+    const sent = new Map(day.pending);
+    function retry(err) {
+      console.error(err);
+      // Retry whatever hasn't been changed again since.
+      sent.forEach((checked, key) => {
+        if (!day.pending.has(key)) day.pending.set(key, checked);
+      });
+      day.flushTimer = day.flushTimer || setTimeout(() => flush(date), 2000);
+    }
+    fetch('/api/boxes/state/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: takeBatch(date)
+    }).then(r => {
+      if (r.ok) return;
+      const err = new Error(`batch update failed: ${r.status}`);
+      // A 4xx (e.g. too many keys, or a date outside the kept range) will
+      // fail the same way every time: drop the batch.
+      if (r.status < 500) console.error(err);
+      else retry(err);
+    }, retry);
+  }
+
+  days.forEach((day, date) => {
+    day.checkboxes.forEach(cb => {
+      cb.addEventListener('change', () => {
+        day.pending.set(cb.dataset.key, cb.checked);
+        day.flushTimer = day.flushTimer || setTimeout(() => flush(date), 300);
+      });
+    });
+  });
+
+  // Don't lose the last ticks when the phone locks or the page closes.
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState !== 'hidden') return;
+    days.forEach((day, date) => {
+      if (day.pending.size) {
+        navigator.sendBeacon(
+          '/api/boxes/state/batch',
+          new Blob([takeBatch(date)], { type: 'application/json' })
+        );
+      }
+    });
+  });
+})();
@@ -0,0 +1,64 @@
+"""DayState deltas: what a polling or reconnecting client is sent."""
+
+from arvo_helper import melbourne_today
+from box_state import BoxStateStore, DayState, MemoryBackend
+
+
+def _day(*updates: dict[str, bool]) -> DayState:
+    day = DayState()
+    for version, update in enumerate(updates, start=1):
+        day.apply(update, version)
+    return day
+
+
+def test_up_to_date_client_gets_nothing():
+    day = _day({"a": True}, {"b": True})
+    assert day.delta(2) is None
+
+
+def test_new_day_is_up_to_date_at_zero():
+    assert DayState().delta(0) is None
+
+
+def test_no_since_gets_the_full_map():
+    day = _day({"a": True}, {"b": False})
+    assert day.delta(None) == ({"a": True, "b": False}, True)
+
+
+def test_since_ahead_of_server_gets_the_full_map():
+    # e.g. the server restarted with a memory backend
+    day = _day({"a": True})
+    assert day.delta(5) == ({"a": True}, True)
+
+
+def test_only_keys_changed_after_since():
+    day = _day({"a": True, "b": True}, {"c": True}, {"d": True})
+    assert day.delta(1) == ({"c": True, "d": True}, False)
+    assert day.delta(2) == ({"d": True}, False)
+    assert day.delta(0) == ({"a": True, "b": True, "c": True, "d": True}, False)
+
+
+def test_repeated_updates_to_one_key():
+    day = _day({"a": True}, {"b": True}, {"a": False}, {"a": True}, {"c": True})
+    # "a" last changed at 4: a client at 2 or 3 needs its latest value, one at 4 doesn't.
+    assert day.delta(2) == ({"a": True, "c": True}, False)
+    assert day.delta(3) == ({"a": True, "c": True}, False)
+    assert day.delta(4) == ({"c": True}, False)
+    # "b" changed at 2 and not since.
+    assert day.delta(1) == ({"b": True, "a": True, "c": True}, False)
+
+
+def test_unchecking_is_a_change():
+    day = _day({"a": True}, {"a": False})
+    assert day.delta(1) == ({"a": False}, False)
+
+
+def test_store_versions_and_deltas():
+    store = BoxStateStore(MemoryBackend())
+    date = melbourne_today().isoformat()
+    assert store.set_many(date, {"a": True}) == 1
+    assert store.set_many(date, {"b": True, "a": False}) == 2
+
+    assert store.get(date, 2) == (2, None)
+    assert store.get(date, 1) == (2, ({"b": True, "a": False}, False))
+    assert store.get(date, 9) == (2, ({"a": False, "b": True}, True))
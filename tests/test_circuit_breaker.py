@@ -0,0 +1,135 @@
+"""CircuitBreaker: closed -> open -> one half-open trial -> closed (or open again)."""
+
+import pytest
+import requests
+
+import arvo_helper
+from arvo_helper import CircuitBreaker, PrismUnavailable
+
+THRESHOLD = 3
+RESET = 30.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(arvo_helper.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(THRESHOLD, RESET)
+
+
+def _fail():
+    raise requests.ConnectionError("down")
+
+
+def _http_error(status: int):
+    def fn():
+        resp = requests.Response()
+        resp.status_code = status
+        raise requests.HTTPError(f"{status}", response=resp)
+
+    return fn
+
+
+def _trip(breaker):
+    for _ in range(THRESHOLD):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(_fail)
+
+
+def test_opens_after_threshold_failures(breaker):
+    for _ in range(THRESHOLD - 1):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(_fail)
+        assert breaker.state == "closed"
+
+    with pytest.raises(requests.ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+
+    calls = []
+    with pytest.raises(PrismUnavailable):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_success_resets_the_failure_count(breaker):
+    for _ in range(THRESHOLD - 1):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(_fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    for _ in range(THRESHOLD - 1):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == "closed"
+
+
+def test_single_half_open_trial_closes_on_success(breaker, clock):
+    _trip(breaker)
+    clock.now += RESET
+    assert breaker.state == "half-open"
+
+    def trial():
+        # While the trial runs, every other call still fails fast.
+        with pytest.raises(PrismUnavailable):
+            breaker.call(lambda: "second")
+        return "ok"
+
+    assert breaker.call(trial) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.call(lambda: "next") == "next"
+
+
+def test_failed_trial_reopens(breaker, clock):
+    _trip(breaker)
+    clock.now += RESET
+    with pytest.raises(requests.ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+    with pytest.raises(PrismUnavailable):
+        breaker.call(lambda: "ok")
+
+    # A full reset_timeout from the failed trial, not from the first opening.
+    clock.now += RESET - 1
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404])
+def test_client_errors_do_not_count(breaker, status):
+    for _ in range(THRESHOLD * 2):
+        with pytest.raises(requests.HTTPError):
+            breaker.call(_http_error(status))
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_server_errors_and_throttling_count(breaker, status):
+    for _ in range(THRESHOLD):
+        with pytest.raises(requests.HTTPError):
+            breaker.call(_http_error(status))
+    assert breaker.state == "open"
+
+
+def test_client_error_closes_a_half_open_breaker(breaker, clock):
+    # Prism answered, so it is up, even if it didn't like the request.
+    _trip(breaker)
+    clock.now += RESET
+    with pytest.raises(requests.HTTPError):
+        breaker.call(_http_error(404))
+    assert breaker.state == "closed"
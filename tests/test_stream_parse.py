@@ -0,0 +1,108 @@
+"""The streaming trackwork decode (iter_trackwork_tasks) against json.loads."""
+
+import hashlib
+import io
+import json
+
+import pytest
+from requests.models import Response
+
+from arvo_helper import _text_chunks, iter_trackwork_tasks
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 64]
+
+
+def _chunks(text: str, size: int):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def _expected(document: str) -> list:
+    """responseData.tasks as json.loads sees it; [] where the stream decode skips it."""
+    data = json.loads(document).get("responseData")
+    tasks = data.get("tasks") if isinstance(data, dict) else None
+    return tasks if isinstance(tasks, list) else []
+
+
+def _response(body: bytes) -> Response:
+    r = Response()
+    r.status_code = 200
+    r.raw = io.BytesIO(body)
+    return r
+
+
+TASKS = [
+    {"id": 1, "horseName": "Plain", "groupName": "Lot 1", "barnName": "Barn A"},
+    {"id": 123456789, "weight": -0.5, "ratio": 1.5e-3, "big": 2E+10, "zero": 0, "neg": -42},
+    {"flags": [True, False, None], "nested": {"tasks": ["not", "these"]}, "empty": {}, "list": []},
+    {"horseName": 'Quote " and \\ backslash', "note": "tab\tnewline\nslash/", "u": "é☃"},
+    {"horseName": "Grâce à Dieu", "emoji": "\U0001f40e", "escaped": "\\ud83d\\ude00"},
+    7,
+    "bare string",
+]
+
+DOCUMENTS = {
+    "tasks": json.dumps({"responseCode": 200, "responseData": {"tasks": TASKS}}),
+    "escaped unicode": json.dumps({"responseData": {"tasks": TASKS}}, ensure_ascii=True),
+    "compact": json.dumps({"responseData": {"tasks": TASKS}}, separators=(",", ":"), ensure_ascii=False),
+    "whitespace": json.dumps({"responseData": {"count": 3, "tasks": TASKS}}, indent=2, ensure_ascii=False),
+    "keys around tasks": json.dumps(
+        {"a": [1, {"tasks": [0]}], "responseData": {"before": 1.25, "tasks": TASKS, "after": "x"}, "z": None}
+    ),
+    "trailing number": '{"responseData": {"tasks": [1, 22, 333.5e1]}, "n": 12345}',
+    "empty tasks": '{"responseData": {"tasks": []}}',
+    "no tasks": '{"responseData": {"count": 0}}',
+    "no responseData": '{"responseCode": 500, "message": "error"}',
+    "tasks not a list": '{"responseData": {"tasks": {"id": 1}}}',
+    "tasks null": '{"responseData": {"tasks": null}}',
+    "responseData not an object": '{"responseData": [{"tasks": [1]}]}',
+    "empty object": "{}",
+}
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_matches_json_loads(name, size):
+    document = DOCUMENTS[name]
+    assert list(iter_trackwork_tasks(_chunks(document, size))) == _expected(document)
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_multibyte_utf8_split_across_chunks(size):
+    document = json.dumps({"responseData": {"tasks": TASKS}}, ensure_ascii=False)
+    body = document.encode()
+    assert len(body) > len(document)  # there are multi-byte characters to split
+
+    hasher = hashlib.sha1()
+    tasks = list(iter_trackwork_tasks(_text_chunks(_response(body), hasher, chunk_size=size)))
+    assert tasks == _expected(document)
+    assert hasher.hexdigest() == hashlib.sha1(body).hexdigest()
+
+
+TRUNCATED = json.dumps({"responseData": {"tasks": TASKS}})
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+@pytest.mark.parametrize("cut", [1, 20, len(TRUNCATED) // 2, len(TRUNCATED) - 2, len(TRUNCATED) - 1])
+def test_truncated_document_raises(cut, size):
+    with pytest.raises(ValueError):
+        list(iter_trackwork_tasks(_chunks(TRUNCATED[:cut], size)))
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+@pytest.mark.parametrize(
+    "document",
+    [
+        "",
+        "[]",
+        '"responseData"',
+        '{"responseData": {"tasks": [1 2]}}',
+        '{"responseData": {"tasks": [{"id": 1,}]}}',
+        '{"responseData": {"tasks": [tru]}}',
+        '{"responseData" {"tasks": []}}',
+        '{"responseData": {"tasks": []} "x": 1}',
+        '{"responseData": {"tasks": ["unterminated]}}',
+    ],
+)
+def test_invalid_document_raises(document, size):
+    with pytest.raises(ValueError):
+        list(iter_trackwork_tasks(_chunks(document, size)))